@@ -1,12 +1,32 @@
 from django.apps import AppConfig
 
+
+def runs_management_command(argv):
+    """
+    Whether argv runs a one-off management command, however it was
+    started: manage.py, django-admin or python -m django
+    """
+    from django.core.management import get_commands
+    return len(argv) > 1 and argv[1] in get_commands() and argv[1] != 'runserver'
+
+
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
     def ready(self):
-        # Only start the updater in the main process
+        from . import signals  # noqa: F401 -- keeps the price target index current
+
+        # Only start the updater in the main process, and never for one-off
+        # management commands such as migrate, shell or test
         import os
+        import sys
+        from django.conf import settings
+        if not getattr(settings, 'RUN_PRICE_UPDATER', True):
+            return
+        if runs_management_command(sys.argv):
+            return
         if os.environ.get('RUN_MAIN', None) != 'true':
-            from .tasks import price_updater
-            price_updater.start()
\ No newline at end of file
+            # Every web process campaigns; only the lease holder runs the jobs
+            from .leader import get_updater_election
+            get_updater_election().start()
\ No newline at end of file
@@ -0,0 +1,155 @@
+# core/benchmark.py
+import json
+import logging
+import math
+import random
+import time
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .db_writer import get_write_queue
+from .fetcher import FetchEngine
+from .models import AlertOutbox, MarketOverview, PriceBar, PriceTarget, Stock, StreamEvent
+from .outbox import OutboxSender
+from .providers import ReplayProvider
+from .stock_monitor import StockMonitor
+from .target_index import target_index
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('fetch', 'evaluate', 'write', 'dispatch', 'total')
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def scenario_key(symbols, density):
+    return f"symbols={symbols},targets_per_symbol={density}"
+
+
+def create_watchlist(provider, symbols, density, seed=0):
+    """Stocks at their first replayed price, with targets within a few percent of it"""
+    rng = random.Random(seed)
+    names = [f"SYM{i:05d}" for i in range(symbols)]
+    quotes = provider.get_quotes(names)
+    stocks = [Stock(symbol=symbol, **quotes[symbol]) for symbol in names if symbol in quotes]
+    for stock in stocks:
+        stock.update_change()
+    Stock.objects.bulk_create(stocks, batch_size=500)
+
+    targets = []
+    for stock in Stock.objects.only('id', 'current_price'):
+        for _ in range(density):
+            direction = rng.choice(('above', 'below', 'exact'))
+            offset = rng.uniform(0.001, 0.03) * (-1 if direction == 'below' else 1)
+            price = stock.current_price * Decimal(str(round(1 + offset, 4)))
+            targets.append(PriceTarget(stock=stock, direction=direction, price=price.quantize(Decimal('0.01'))))
+    PriceTarget.objects.bulk_create(targets, batch_size=500)
+    target_index.reset()
+
+
+def clear_watchlist():
+    for model in (AlertOutbox, PriceBar, MarketOverview, PriceTarget, Stock, StreamEvent):
+        model.objects.all().delete()
+    target_index.reset()
+
+
+def run_scenario(symbols, density, cycles=10, seed=0):
+    """
+    Run `cycles` update cycles over a synthetic watchlist and return
+    per-phase latency percentiles, throughput and query counts.
+    Expects an empty test database and the locmem email backend.
+    """
+    provider = ReplayProvider(seed=seed)
+    create_watchlist(provider, symbols, density, seed)
+    fetcher = FetchEngine(provider, max_workers=4, rate=1e6, burst=1e6)
+    monitor = StockMonitor(provider=provider, fetcher=fetcher)
+    sender = OutboxSender()
+    # Queued writes run on the writer thread's own connection, out of sight
+    # of CaptureQueriesContext, so run them inline while measuring
+    writes = get_write_queue()
+    queued, writes.enabled = writes.enabled, False
+
+    timings = {phase: [] for phase in PHASES}
+    queries = []
+    alerts = 0
+    try:
+        for _ in range(cycles):
+            started = time.monotonic()
+            with CaptureQueriesContext(connection) as captured:
+                monitor.update_all_stocks()
+                dispatch_started = time.monotonic()
+                while True:
+                    sent = sender.send_pending()
+                    alerts += sent
+                    if sent < sender.batch_size:
+                        break
+            finished = time.monotonic()
+
+            for phase, seconds in monitor.last_timings.items():
+                timings[phase].append(seconds)
+            timings['dispatch'].append(finished - dispatch_started)
+            timings['total'].append(finished - started)
+            queries.append(len(captured))
+    finally:
+        writes.enabled = queued
+        fetcher.executor.shutdown(wait=True)
+        sender.close_connection()
+        clear_watchlist()
+
+    total_time = sum(timings['total'])
+    return {
+        'symbols': symbols,
+        'targets_per_symbol': density,
+        'cycles': cycles,
+        'symbols_per_second': round(symbols * cycles / total_time, 1) if total_time else 0.0,
+        'alerts': alerts,
+        'queries_per_cycle': max(queries),
+        'latency': {
+            phase: {'p50': round(percentile(values, 50), 4), 'p99': round(percentile(values, 99), 4)}
+            for phase, values in timings.items() if values
+        },
+    }
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.005):
+    """
+    Regressions of `results` against a stored baseline: p50/p99 cycle
+    latency more than `tolerance` slower (ignoring differences under
+    `min_seconds`), lower throughput, or any extra queries per cycle.
+    """
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for stat in ('p50', 'p99'):
+            now = result['latency']['total'][stat]
+            before = expected['latency']['total'][stat]
+            if now > before * (1 + tolerance) and now - before > min_seconds:
+                regressions.append(f"{key}: total {stat} {now:.4f}s vs baseline {before:.4f}s")
+        if result['symbols_per_second'] < expected['symbols_per_second'] / (1 + tolerance):
+            regressions.append(f"{key}: {result['symbols_per_second']} symbols/s "
+                               f"vs baseline {expected['symbols_per_second']}")
+        if result['queries_per_cycle'] > expected['queries_per_cycle']:
+            regressions.append(f"{key}: {result['queries_per_cycle']} queries per cycle "
+                               f"vs baseline {expected['queries_per_cycle']}")
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,88 @@
+# core/card_cache.py
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+from .models import PriceTarget
+from .watchlist import watched_stocks
+
+logger = logging.getLogger(__name__)
+
+
+class CardCache:
+    """
+    Rendered dashboard cards cached per stock, version and user, since a
+    card shows only the viewing user's targets.
+
+    Stock.version is bumped whenever a stock's quote or targets change, so
+    a cached card never needs invalidating: a new version gets a new key
+    and old ones expire after `timeout`. A page load fetches all cards in
+    one get_many and renders only those whose version moved on.
+    """
+
+    def __init__(self, timeout=86400):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.render_total = 0.0
+
+    def key(self, stock_id, version, user=None):
+        return f"card:{stock_id}:{version}:{user.id if user else 'all'}"
+
+    def render(self, stock_ids, user=None):
+        """{stock id: (version, html)} for freshly rendered cards"""
+        targets = PriceTarget.objects.filter(is_active=True)
+        if user is not None:
+            targets = targets.filter(user=user)
+        stocks = watched_stocks(user).filter(id__in=stock_ids).prefetch_related(
+            Prefetch('pricetarget_set', queryset=targets)
+        )
+        return {
+            stock.id: (stock.version, render_to_string('core/stock_card.html', {'stock': stock}))
+            for stock in stocks
+        }
+
+    def cards(self, user=None):
+        """Cards for `user`'s watchlist, showing their targets, in dashboard order"""
+        versions = list(watched_stocks(user).values_list('id', 'version'))
+        keys = {self.key(stock_id, version, user): stock_id for stock_id, version in versions}
+        html = {keys[key]: card for key, card in cache.get_many(list(keys)).items()}
+
+        missing = [stock_id for stock_id, _ in versions if stock_id not in html]
+        if missing:
+            started = time.monotonic()
+            rendered = self.render(missing, user)
+            cache.set_many(
+                {self.key(stock_id, version, user): card for stock_id, (version, card) in rendered.items()},
+                timeout=self.timeout,
+            )
+            html.update((stock_id, card) for stock_id, (_, card) in rendered.items())
+            elapsed = time.monotonic() - started
+            logger.info(f"Rendered {len(rendered)} of {len(versions)} dashboard cards in {elapsed:.3f}s")
+        else:
+            elapsed = 0.0
+
+        with self.lock:
+            self.hits += len(versions) - len(missing)
+            self.misses += len(missing)
+            self.render_total += elapsed
+        return [html[stock_id] for stock_id, _ in versions if stock_id in html]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'render_total': self.render_total,
+            }
+
+
+card_cache = CardCache(getattr(settings, 'CARD_CACHE_SECONDS', 86400))
@@ -0,0 +1,114 @@
+# core/db_writer.py
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """
+    Funnels database writes through one writer thread.
+
+    SQLite allows a single writer at a time, so writes from the updater
+    and from web requests would otherwise queue up on the database lock
+    and fail with "database is locked" when they wait too long. Callers
+    hand a function to run() and wait for its result; the writer runs
+    every job waiting, up to `max_batch`, in one transaction, each in its
+    own savepoint so a failing job only rolls back its own changes.
+
+    Readers never go through the queue. With WAL enabled they read the
+    last committed snapshot while the writer works.
+    """
+
+    def __init__(self, enabled=True, max_batch=100):
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+        self.jobs_run = 0
+
+    def run(self, func, *args, **kwargs):
+        """Run func on the writer thread and return its result"""
+        # Writes inside a caller's transaction must stay in it, and the
+        # writer would only wait on the lock that transaction holds
+        if (not self.enabled or threading.current_thread() is self.thread
+                or connection.in_atomic_block):
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func for the writer thread and return a Future for its result"""
+        self.start()
+        future = Future()
+        self.jobs.put((future, func, args, kwargs))
+        return future
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.process, name='db-writer')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def process(self):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        """Run one batch of jobs in a single transaction"""
+        close_old_connections()
+        results = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            logger.error(f"Error committing {len(batch)} queued writes: {str(e)}")
+            for future, _, _ in results:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.jobs_run += len(results)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'jobs': self.jobs_run,
+            'queued': self.jobs.qsize(),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_write_queue():
+    """Return the process-wide queue configured in settings.DATABASE_WRITER"""
+    config = getattr(settings, 'DATABASE_WRITER', {})
+    return WriteQueue(
+        enabled=config.get('ENABLED', False),
+        max_batch=config.get('MAX_BATCH', 100),
+    )
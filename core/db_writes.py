@@ -0,0 +1,105 @@
+# core/db_writes.py
+import logging
+import time
+
+from django.db import transaction
+
+from .db_writer import get_write_queue
+from .events import group_events
+from .metrics import PROCESS_ID, flush_seconds
+from .models import AlertOutbox, PriceBar, PriceTarget, Stock, StreamEvent
+from .overview import overview_data
+
+logger = logging.getLogger(__name__)
+
+
+class PendingWrites:
+    """
+    Row changes collected during one update cycle.
+
+    Stocks are grouped by the set of fields that changed so each group is
+    written with one bulk_update limited to those columns. Queued alert
+    emails are inserted into the outbox in the same transaction as the
+    last_triggered stamps, so an alert is recorded exactly when its
+    target is marked as triggered. Events go in too, as StreamEvent rows
+    for web processes that don't run the updater.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.stocks = {}  # frozenset of changed fields -> [Stock, ...]
+        self.triggers = {}  # target id -> last_triggered
+        self.alerts = []  # unsaved AlertOutbox rows
+        self.events = []  # (event, data) to publish once written
+        self.bars = []  # completed PriceBar rows to append
+        self.overview = None  # unsaved MarketOverview for the cycle
+
+    def __len__(self):
+        return (sum(len(stocks) for stocks in self.stocks.values()) + len(self.triggers)
+                + len(self.alerts) + len(self.bars) + (self.overview is not None))
+
+    def add_stock(self, stock, fields):
+        if fields:
+            self.stocks.setdefault(frozenset(fields), []).append(stock)
+
+    def add_trigger(self, target_id, when):
+        self.triggers[target_id] = when
+
+    def add_alert(self, alert):
+        self.alerts.append(alert)
+
+    def add_bars(self, bars):
+        self.bars.extend(bars)
+
+    def set_overview(self, overview):
+        self.overview = overview
+
+    def add_event(self, event, data):
+        self.events.append((event, data))
+
+    def take_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def flush(self):
+        """Write all pending changes on the writer thread and return the row count"""
+        count = len(self)
+        if not count:
+            return 0
+
+        started = time.monotonic()
+        get_write_queue().run(self.write)
+        elapsed = time.monotonic() - started
+        flush_seconds.observe(elapsed)
+        logger.info(f"Flushed {count} rows in {elapsed:.3f}s")
+        self.stocks = {}
+        self.triggers = {}
+        self.alerts = []
+        self.bars = []
+        self.overview = None
+        return count
+
+    def write(self):
+        """Apply the pending changes in one transaction"""
+        with transaction.atomic():
+            for fields, stocks in self.stocks.items():
+                Stock.objects.bulk_update(stocks, sorted(fields), batch_size=self.batch_size)
+            if self.triggers:
+                PriceTarget.objects.bulk_update(
+                    [PriceTarget(id=target_id, last_triggered=when) for target_id, when in self.triggers.items()],
+                    ['last_triggered'],
+                    batch_size=self.batch_size,
+                )
+            if self.alerts:
+                AlertOutbox.objects.bulk_create(self.alerts, batch_size=self.batch_size)
+            if self.bars:
+                PriceBar.objects.bulk_create(self.bars, batch_size=self.batch_size, ignore_conflicts=True)
+            if self.overview is not None:
+                self.overview.save()
+                self.add_event('overview', overview_data(self.overview))
+            if self.events:
+                StreamEvent.objects.bulk_create(
+                    [StreamEvent(origin=PROCESS_ID, event=event, data=data)
+                     for event, data in group_events(self.events)],
+                    batch_size=self.batch_size,
+                )
@@ -0,0 +1,80 @@
+# core/digest.py
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+from .models import PriceTarget
+
+CONDITION_LABELS = dict(PriceTarget.CONDITION_CHOICES)
+
+
+class AlertDigest:
+    """
+    Coalesces triggered targets into one summary email per recipient.
+
+    Triggers are grouped by recipient and then by symbol. The monitor
+    drains the digest at the end of every update cycle, or earlier once
+    the oldest trigger has waited `max_delay` seconds.
+    """
+
+    def __init__(self, max_delay=120):
+        self.max_delay = max_delay
+        self.entries = {}  # recipient -> {symbol: [trigger, ...]}
+        self.oldest = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, recipient, stock, target, current_price):
+        symbols = self.entries.setdefault(recipient, {})
+        symbols.setdefault(stock.symbol, []).append({
+            'name': stock.name,
+            'direction': target.direction,
+            'condition': target.condition,
+            'target_price': target.price,
+            'current_price': current_price,
+            'previous_close': stock.previous_close,
+            'day_low': stock.day_low,
+            'day_high': stock.day_high,
+        })
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        self.count += 1
+
+    def is_due(self):
+        return self.oldest is not None and time.monotonic() - self.oldest >= self.max_delay
+
+    def drain(self):
+        """Return one (recipient, subject, message) per recipient and reset"""
+        messages = []
+        now = datetime.now().strftime('%I:%M %p, %b %d, %Y')
+        for recipient, symbols in self.entries.items():
+            count = sum(len(triggers) for triggers in symbols.values())
+            subject = (f"🚨 StockWatch Alert Digest: {count} target{'s' if count != 1 else ''} "
+                       f"on {', '.join(sorted(symbols))}")
+            lines = [f"{count} of your price targets were triggered.\n"]
+            for symbol in sorted(symbols):
+                triggers = symbols[symbol]
+                first = triggers[0]
+                lines.append(f"{symbol} ({first['name']})")
+                lines.append(f"  Current Price: ${first['current_price']}  "
+                             f"Previous Close: ${first['previous_close']}  "
+                             f"Today's Range: ${first['day_low']} - ${first['day_high']}")
+                for trigger in triggers:
+                    if trigger['condition'] == 'price':
+                        lines.append(f"  - {trigger['direction']} ${trigger['target_price']}")
+                    else:
+                        label = CONDITION_LABELS[trigger['condition']]
+                        lines.append(f"  - {label} {trigger['direction']} {trigger['target_price']}")
+                lines.append("")
+            lines.append(f"Time: {now}\n")
+            lines.append(f"View more details at: {settings.SITE_URL}/dashboard/\n")
+            lines.append("StockWatch - Your Market Monitor")
+            messages.append((recipient, subject, "\n".join(lines)))
+
+        self.entries = {}
+        self.oldest = None
+        self.count = 0
+        return messages
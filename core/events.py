@@ -0,0 +1,161 @@
+# core/events.py
+import asyncio
+import json
+import logging
+import threading
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .metrics import PROCESS_ID
+from .models import StreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+def group_events(events):
+    """
+    (event, data) pairs as clients receive them: every price change in
+    one 'prices' event, followed by the other events in order
+    """
+    prices = [data for event, data in events if event == 'price']
+    grouped = [('prices', prices)] if prices else []
+    grouped.extend((event, data) for event, data in events if event != 'price')
+    return grouped
+
+
+class EventHub:
+    """
+    Fans updater events out to connected server-sent-event clients.
+
+    Each client is an asyncio queue on the server's event loop. The
+    updater thread formats an event once and hands it to every loop with
+    call_soon_threadsafe, so an idle client costs one queue and one
+    suspended coroutine. Slow clients drop their oldest events rather
+    than growing without bound.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queue))
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    @staticmethod
+    def _put(queue, payload):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+    def publish(self, event, data):
+        """Send an event to every subscriber; safe to call from any thread"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return
+
+        payload = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, payload)
+            except RuntimeError:
+                # The client's event loop has shut down
+                self.unsubscribe((loop, queue))
+
+
+class EventRelay:
+    """
+    Publishes events from updaters in other processes to this process's
+    hub.
+
+    The updater may run in a worker (run_price_worker) or in whichever web
+    process holds the leader lease, so most web processes never see its
+    events in memory. It stores each event as a StreamEvent row in the
+    same transaction as the changes it describes, and every process with
+    streaming clients polls for rows newer than the last it relayed,
+    skipping its own.
+    """
+
+    def __init__(self, hub, origin=PROCESS_ID, interval=2, batch_size=500):
+        self.hub = hub
+        self.origin = origin
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_id = None
+        self.relayed = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def poll(self):
+        """Publish events stored since the last poll and return how many there were"""
+        if not len(self.hub):
+            # Nobody to send them to; start from the newest row once someone connects
+            self.last_id = None
+            return 0
+        if self.last_id is None:
+            self.last_id = StreamEvent.objects.aggregate(last=Max('id'))['last'] or 0
+            return 0
+
+        relayed = 0
+        rows = (StreamEvent.objects.filter(id__gt=self.last_id).order_by('id')
+                .values_list('id', 'origin', 'event', 'data')[:self.batch_size])
+        for row_id, origin, event, data in rows:
+            self.last_id = row_id
+            if origin != self.origin:
+                self.hub.publish(event, data)
+                relayed += 1
+        self.relayed += relayed
+        return relayed
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error relaying stream events: {str(e)}")
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            logger.info("Starting stream event relay...")
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name='event-relay')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+def prune_events(seconds=None):
+    """Delete stream events older than `seconds`, by default EVENT_RETENTION_SECONDS"""
+    if seconds is None:
+        seconds = getattr(settings, 'STATE_SYNC', {}).get('EVENT_RETENTION_SECONDS', 3600)
+    return StreamEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=seconds)).delete()[0]
+
+
+event_hub = EventHub()
+
+
+@lru_cache(maxsize=None)
+def get_event_relay():
+    """Relay into event_hub, polling every STATE_SYNC['POLL_SECONDS']"""
+    config = getattr(settings, 'STATE_SYNC', {})
+    return EventRelay(event_hub, interval=config.get('POLL_SECONDS', 2))
@@ -0,0 +1,193 @@
+# core/fetcher.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from django.conf import settings
+
+from .metrics import provider_errors, provider_request_seconds
+from .providers import get_provider
+from .quote_cache import PRICE_FIELDS, quote_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, up to `burst` saved.
+    A rate of 0 or less disables the limit. At least one token can always
+    be saved, or a request could never take one.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """Block until a token is available and return the seconds spent waiting"""
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchEngine:
+    """
+    Concurrent quote fetching governed by a token bucket.
+
+    Symbols still fresh in the quote cache are served from it. The rest
+    are split into provider-sized batches which run on a thread pool.
+    Every provider request first takes a token, so the request rate never
+    exceeds the configured limit however many workers are busy.
+    """
+
+    def __init__(self, provider=None, max_workers=4, rate=2.0, burst=4, batch_size=100, cache=None):
+        self.provider = provider or get_provider()
+        self.cache = cache
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(rate, burst)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quote-fetch')
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.fetched_at = {}  # symbol -> wall-clock time of its last successful fetch
+
+    def _fetch_batch(self, batch, submitted_at):
+        self.bucket.acquire()
+        queued = time.monotonic() - submitted_at
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.requests += 1
+            self.queue_wait_total += queued
+            self.queue_wait_max = max(self.queue_wait_max, queued)
+        started = time.monotonic()
+        try:
+            quotes = self.provider.get_quotes(batch)
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            for symbol in batch:
+                provider_errors.inc(symbol)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            provider_request_seconds.observe(time.monotonic() - started, 'batch')
+
+        if len(quotes) < len(batch):
+            for symbol in batch:
+                if symbol not in quotes:
+                    provider_errors.inc(symbol)
+        now = time.time()
+        for symbol in quotes:
+            self.fetched_at[symbol] = now
+        return quotes
+
+    def fetch_one(self, symbol):
+        """Fetch a full quote for one symbol within the same rate limit"""
+        if self.cache is not None:
+            cached = self.cache.get(symbol)
+            if cached is not None:
+                return cached
+
+        self.bucket.acquire()
+        with self.lock:
+            self.requests += 1
+        with provider_request_seconds.time('single'):
+            quote = self.provider.get_quote(symbol)
+        if not quote:
+            provider_errors.inc(symbol.upper())
+            return quote
+        self.fetched_at[symbol.upper()] = time.time()
+        if self.cache is not None:
+            self.cache.put(symbol, quote)
+        return quote
+
+    def fetch(self, symbols, refresh=False):
+        """
+        Fetch quotes for all symbols and return a symbol -> quote mapping.
+        With refresh=True every symbol is requested from the provider and
+        the cache is only written to.
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        quotes = {}
+        misses = symbols
+        if self.cache is not None and not refresh:
+            misses = []
+            for symbol in symbols:
+                cached = self.cache.get(symbol, PRICE_FIELDS)
+                if cached is not None:
+                    quotes[symbol] = cached
+                else:
+                    misses.append(symbol)
+
+        batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        submitted_at = time.monotonic()
+        futures = {
+            self.executor.submit(self._fetch_batch, batch, submitted_at): batch
+            for batch in batches
+        }
+
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                fetched = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching batch starting at {batch[0]}: {str(e)}")
+                continue
+            quotes.update(fetched)
+            if self.cache is not None:
+                for symbol, quote in fetched.items():
+                    self.cache.put(symbol, quote)
+
+        logger.info(f"Fetched {len(quotes)} of {len(symbols)} quotes "
+                    f"({len(symbols) - len(misses)} cached) in {len(batches)} batches "
+                    f"({time.monotonic() - submitted_at:.2f}s)")
+        return quotes
+
+    def stats(self):
+        """Snapshot of request counters and queueing delay"""
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'requests': self.requests,
+                'errors': self.errors,
+                'queue_wait_avg': self.queue_wait_total / self.requests if self.requests else 0.0,
+                'queue_wait_max': self.queue_wait_max,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_fetch_engine():
+    """Return the process-wide engine configured in settings.QUOTE_FETCH"""
+    config = getattr(settings, 'QUOTE_FETCH', {})
+    return FetchEngine(
+        max_workers=config.get('MAX_WORKERS', 4),
+        rate=config.get('RATE', 2.0),
+        burst=config.get('BURST', 4),
+        batch_size=config.get('BATCH_SIZE', 100),
+        cache=quote_cache,
+    )
@@ -0,0 +1,90 @@
+# core/history.py
+import logging
+from datetime import timedelta
+
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PriceBar
+
+logger = logging.getLogger(__name__)
+
+
+class BarAggregator:
+    """
+    Rolls quotes up into one-minute bars.
+
+    A bar is completed when the first quote of a later minute arrives for
+    the same symbol. Quotes carry the cumulative day volume, so a bar's
+    volume is the increase over the previous quote.
+    """
+
+    def __init__(self):
+        self.open_bars = {}  # symbol -> PriceBar being built
+        self.last_volume = {}  # symbol -> cumulative volume at last quote
+        self.completed = []
+
+    def add(self, symbol, price, volume=None, when=None):
+        minute = (when or timezone.now()).replace(second=0, microsecond=0)
+        traded = 0
+        if volume is not None:
+            previous = self.last_volume.get(symbol)
+            traded = volume - previous if previous is not None and volume >= previous else 0
+            self.last_volume[symbol] = volume
+
+        bar = self.open_bars.get(symbol)
+        if bar is not None and bar.timestamp == minute:
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+            bar.volume += traded
+            return
+
+        if bar is not None:
+            self.completed.append(bar)
+        self.open_bars[symbol] = PriceBar(
+            symbol=symbol, timestamp=minute,
+            open=price, high=price, low=price, close=price, volume=traded,
+        )
+
+    def take_completed(self):
+        """Return bars that can no longer change and forget them"""
+        completed, self.completed = self.completed, []
+        return completed
+
+
+def get_bars(symbol, start=None, end=None):
+    """(timestamp, open, high, low, close, volume) rows for a symbol in time order"""
+    bars = PriceBar.objects.filter(symbol=symbol.upper())
+    if start:
+        bars = bars.filter(timestamp__gte=start)
+    if end:
+        bars = bars.filter(timestamp__lt=end)
+    return list(bars.order_by('timestamp').values_list('timestamp', 'open', 'high', 'low', 'close', 'volume'))
+
+
+def daily_closes(symbol, days=30):
+    """Closing price of each day over the last `days` days, oldest first"""
+    bars = PriceBar.objects.filter(
+        symbol=symbol.upper(),
+        timestamp__gte=timezone.now() - timedelta(days=days),
+    )
+    last_bars = bars.annotate(day=TruncDate('timestamp')).values('day').annotate(last=Max('timestamp'))
+    return list(
+        bars.filter(timestamp__in=last_bars.values('last'))
+        .order_by('timestamp')
+        .values_list('close', flat=True)
+    )
+
+
+def recent_closes(symbols, minutes=60, limit=30):
+    """Last `limit` bar closes per symbol from the past `minutes`, in one query"""
+    closes = {}
+    bars = PriceBar.objects.filter(
+        symbol__in=[symbol.upper() for symbol in symbols],
+        timestamp__gte=timezone.now() - timedelta(minutes=minutes),
+    ).order_by('symbol', 'timestamp').values_list('symbol', 'close')
+    for symbol, close in bars:
+        closes.setdefault(symbol, []).append(close)
+    return {symbol: values[-limit:] for symbol, values in closes.items()}
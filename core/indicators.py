@@ -0,0 +1,136 @@
+# core/indicators.py
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class RollingMean:
+    """Mean of the last `period` values using a ring buffer and a running sum"""
+    __slots__ = ('period', 'values', 'total')
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+
+    def add(self, value):
+        if len(self.values) == self.period:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def value(self):
+        if len(self.values) < self.period:
+            return None
+        return self.total / self.period
+
+
+class RSI:
+    """Relative strength index with Wilder's smoothing, O(1) per update"""
+    __slots__ = ('period', 'last', 'count', 'avg_gain', 'avg_loss')
+
+    def __init__(self, period=14):
+        self.period = period
+        self.last = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def add(self, price):
+        if self.last is not None:
+            change = price - self.last
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if self.count < self.period:
+                # Simple average over the first `period` changes
+                self.count += 1
+                self.avg_gain += (gain - self.avg_gain) / self.count
+                self.avg_loss += (loss - self.avg_loss) / self.count
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        self.last = price
+
+    @property
+    def value(self):
+        if self.count < self.period:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+
+class IndicatorState:
+    """Per-symbol MA5, MA20 and RSI14, plus the previous values for crossovers"""
+    __slots__ = ('ma5', 'ma20', 'rsi', 'price', 'previous')
+
+    def __init__(self):
+        self.ma5 = RollingMean(5)
+        self.ma20 = RollingMean(20)
+        self.rsi = RSI(14)
+        self.price = None
+        self.previous = None  # (price, ma5, ma20) before the latest update
+
+    def add(self, price):
+        price = float(price)
+        self.previous = (self.price, self.ma5.value, self.ma20.value)
+        self.ma5.add(price)
+        self.ma20.add(price)
+        self.rsi.add(price)
+        self.price = price
+
+    @staticmethod
+    def _crossed(before, after, direction):
+        """Whether the a - b spread changed sign in the given direction"""
+        if None in before or None in after:
+            return False
+        was, now = before[0] - before[1], after[0] - after[1]
+        if direction == 'above':
+            return was <= 0 < now
+        return was >= 0 > now
+
+    def is_triggered(self, condition, direction, threshold):
+        """Evaluate an indicator condition against the latest update"""
+        if self.previous is None:
+            return False
+        previous_price, previous_ma5, previous_ma20 = self.previous
+
+        if condition == 'price_ma20':
+            return self._crossed((previous_price, previous_ma20), (self.price, self.ma20.value), direction)
+        if condition == 'ma5_ma20':
+            return self._crossed((previous_ma5, previous_ma20), (self.ma5.value, self.ma20.value), direction)
+        if condition == 'rsi':
+            rsi = self.rsi.value
+            if rsi is None:
+                return False
+            return rsi > float(threshold) if direction == 'above' else rsi < float(threshold)
+        return False
+
+
+class IndicatorBook:
+    """IndicatorState for every symbol the updater has seen"""
+
+    def __init__(self):
+        self.states = {}
+
+    def __len__(self):
+        return len(self.states)
+
+    def get(self, symbol):
+        return self.states.get(symbol)
+
+    def update(self, symbol, price):
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = IndicatorState()
+        state.add(price)
+        return state
+
+    def seed(self, closes_by_symbol):
+        """Warm up states from stored history so crossovers work from the first quote"""
+        for symbol, closes in closes_by_symbol.items():
+            if symbol not in self.states:
+                for close in closes:
+                    self.update(symbol, close)
+        logger.info(f"Seeded indicators for {len(closes_by_symbol)} symbols")
@@ -0,0 +1,193 @@
+# core/leader.py
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from .db_writer import get_write_queue
+from .models import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+
+def process_identity():
+    """Unique name for this process, readable in the lease table"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class DatabaseLease:
+    """
+    Lease stored in a WorkerLease row, shared by every process using the
+    database. Expiry is computed with the database clock, so hosts with
+    skewed clocks still agree on when a lease has lapsed.
+    """
+
+    def __init__(self, name, identity, ttl=30):
+        self.name = name
+        self.identity = identity
+        self.ttl = ttl
+
+    def acquire(self):
+        """Take or renew the lease; True while this process holds it"""
+        return get_write_queue().run(self._acquire)
+
+    def _acquire(self):
+        expires_at = Now() + timedelta(seconds=self.ttl)
+        # A single conditional UPDATE, so two processes can't both take an expired lease
+        taken = WorkerLease.objects.filter(name=self.name).filter(
+            Q(holder=self.identity) | Q(expires_at__lte=Now())
+        ).update(holder=self.identity, expires_at=expires_at, renewed_at=Now())
+        if taken:
+            return True
+        try:
+            with transaction.atomic():
+                WorkerLease.objects.create(
+                    name=self.name, holder=self.identity, expires_at=expires_at, renewed_at=Now(),
+                )
+            return True
+        except IntegrityError:
+            return False  # Someone else holds it
+
+    def release(self):
+        get_write_queue().run(
+            WorkerLease.objects.filter(name=self.name, holder=self.identity).update, expires_at=Now(),
+        )
+
+
+class FileLease:
+    """
+    Lease held as an exclusive lock on a local file, for deployments
+    where every worker runs on one host. The operating system drops the
+    lock as soon as the holding process exits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        if self.file is not None:
+            return True
+        import fcntl  # Unix only, so imported when this backend is chosen
+
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self.file = lock_file
+        return True
+
+    def release(self):
+        if self.file is not None:
+            import fcntl
+
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+class LeaderElection:
+    """
+    Keeps trying to hold a lease and runs `on_elected`/`on_deposed` as
+    leadership changes hands.
+
+    The lease is renewed every `interval` seconds. A leader that fails to
+    renew steps down at once, and a dead leader's lease lapses after its
+    TTL, so another process takes over within TTL + interval seconds.
+    """
+
+    def __init__(self, lease, interval=10, on_elected=None, on_deposed=None):
+        self.lease = lease
+        self.interval = interval
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.is_leader = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def check(self):
+        """Try to take or renew the lease once and react to the outcome"""
+        try:
+            held = self.lease.acquire()
+        except Exception as e:
+            logger.error(f"Error renewing leader lease: {str(e)}")
+            held = False
+
+        if held and not self.is_leader:
+            logger.info("Elected leader, starting background jobs")
+            self.is_leader = True
+            if self.on_elected:
+                self.on_elected()
+        elif not held and self.is_leader:
+            logger.warning("Lost leader lease, stopping background jobs")
+            self.is_leader = False
+            if self.on_deposed:
+                self.on_deposed()
+        return held
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.check()
+            self.stop_event.wait(self.interval)
+
+        if self.is_leader:
+            self.is_leader = False
+            if self.on_deposed:
+                self.on_deposed()
+            try:
+                self.lease.release()
+            except Exception as e:
+                logger.error(f"Error releasing leader lease: {str(e)}")
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name='leader-election')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+def build_lease(name):
+    config = getattr(settings, 'LEADER_ELECTION', {})
+    if config.get('BACKEND', 'database') == 'file':
+        return FileLease(config.get('LOCK_FILE') or os.path.join(settings.BASE_DIR, f'{name}.lock'))
+    return DatabaseLease(name, process_identity(), ttl=config.get('LEASE_SECONDS', 30))
+
+
+@lru_cache(maxsize=None)
+def get_updater_election():
+    """Election deciding which process runs the price updater and outbox sender"""
+    from .outbox import outbox_sender
+    from .tasks import price_updater
+
+    def elected():
+        price_updater.start()
+        outbox_sender.start()
+
+    def deposed():
+        price_updater.stop()
+        outbox_sender.stop()
+
+    config = getattr(settings, 'LEADER_ELECTION', {})
+    return LeaderElection(
+        build_lease('price-updater'),
+        interval=config.get('RENEW_SECONDS', 10),
+        on_elected=elected,
+        on_deposed=deposed,
+    )
@@ -0,0 +1,111 @@
+# core/logging_utils.py
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+
+class LazyJSON:
+    """
+    Log argument that serialises `value` only if the record is emitted:
+
+        logger.debug("Quote received: %s", LazyJSON(info))
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=str)
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them
+    with a `target` handler, built from the remaining keyword arguments.
+
+    The logging thread only pays for an enqueue. When the queue is full,
+    records are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, target='logging.StreamHandler', queue_size=10000, **kwargs):
+        super().__init__(queue.Queue(queue_size))
+        self.target = import_string(target)(**kwargs)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; records never leave the process
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each call site log at most `burst` records at once and `rate`
+    per second after that; the next record let through notes how many
+    were suppressed. Records at `min_level` or above always pass.
+
+    The decision is stored on the record, so one filter instance can be
+    shared by several handlers without spending tokens twice.
+    """
+
+    def __init__(self, rate=1.0, burst=20, min_level='ERROR'):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_level = logging._checkLevel(min_level)
+        self.lock = threading.Lock()
+        self.buckets = {}  # (logger, line) -> [tokens, last_refill, suppressed]
+
+    def filter(self, record):
+        allowed = getattr(record, 'rate_limit_allowed', None)
+        if allowed is not None:
+            return allowed
+        if record.levelno >= self.min_level:
+            return True
+
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                suppressed, bucket[2] = bucket[2], 0
+                allowed = True
+            else:
+                bucket[2] += 1
+                allowed = False
+
+        if allowed and suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        record.rate_limit_allowed = allowed
+        return allowed
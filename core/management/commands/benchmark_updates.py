@@ -0,0 +1,87 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core.benchmark import compare, load_baseline, run_scenario, save_baseline, scenario_key
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark update cycles against synthetic watchlists in a throwaway test database "
+        "and fail if they regress against the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int_list, default=[10, 100, 1000, 10000],
+                            help="Comma-separated watchlist sizes (default: 10,100,1000,10000)")
+        parser.add_argument('--densities', type=int_list, default=[0, 1, 5],
+                            help="Comma-separated targets per symbol (default: 0,1,5)")
+        parser.add_argument('--cycles', type=int, default=10, help="Update cycles per scenario")
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'),
+                            help="Baseline results to compare against")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store these results as the new baseline instead of comparing")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed slowdown before a scenario counts as a regression")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if not options['save_baseline']:
+            # Fail before spending minutes on scenarios there is nothing to compare with
+            baseline = load_baseline(options['baseline'])
+            if not baseline:
+                raise CommandError(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+
+        # Keep per-cycle log lines out of the report
+        logging.disable(logging.INFO)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(NOTIFICATION_EMAIL='benchmark@example.com', ALERT_DIGEST={}):
+                results = self.run_all(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline for {len(results)} scenarios to {options['baseline']}"))
+            return
+
+        regressions = compare(results, baseline, tolerance=options['tolerance'])
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def run_all(self, options):
+        results = {}
+        self.stdout.write(
+            f"{'symbols':>8} {'targets':>8} {'sym/s':>10} {'queries':>8} {'alerts':>7} "
+            f"{'fetch p50/p99':>16} {'eval p50/p99':>16} {'write p50/p99':>16} "
+            f"{'dispatch p50/p99':>17} {'total p50/p99':>16}"
+        )
+        for symbols in options['sizes']:
+            for density in options['densities']:
+                result = run_scenario(symbols, density, cycles=options['cycles'])
+                results[scenario_key(symbols, density)] = result
+                latency = result['latency']
+                self.stdout.write(
+                    f"{symbols:>8} {density:>8} {result['symbols_per_second']:>10} "
+                    f"{result['queries_per_cycle']:>8} {result['alerts']:>7} "
+                    + " ".join(
+                        f"{latency[phase]['p50'] * 1000:>7.1f}/{latency[phase]['p99'] * 1000:<7.1f}ms"
+                        for phase in ('fetch', 'evaluate', 'write', 'dispatch', 'total')
+                    )
+                )
+        return results
@@ -0,0 +1,80 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.leader import LeaderElection, build_lease
+from core.outbox import outbox_sender
+from core.sharding import ShardMembership
+from core.tasks import StockPriceUpdater
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the price update and alert pipeline outside the web server. "
+        "Start several to split symbols between them by consistent hashing; "
+        "set RUN_PRICE_UPDATER=False for the web processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-id', default=f"{socket.gethostname()}-{os.getpid()}",
+            help="Stable name for this worker on the hash ring (default: host-pid)",
+        )
+        parser.add_argument(
+            '--workers',
+            help="Comma-separated fixed list of worker ids; without it workers find each other through the database",
+        )
+        parser.add_argument(
+            '--heartbeat', type=float, default=10,
+            help="Seconds between membership heartbeats",
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id']
+        workers = [worker.strip() for worker in options['workers'].split(',')] if options['workers'] else None
+        if workers and worker_id not in workers:
+            self.stderr.write(f"--worker-id {worker_id} is not in --workers")
+            return
+
+        config = getattr(settings, 'LEADER_ELECTION', {})
+        # The leader sends queued alerts and writes the market overview for everyone
+        election = LeaderElection(
+            build_lease('price-updater'),
+            interval=config.get('RENEW_SECONDS', 10),
+            on_elected=outbox_sender.start,
+            on_deposed=outbox_sender.stop,
+        )
+        membership = ShardMembership(
+            worker_id, workers=workers, ttl=config.get('LEASE_SECONDS', 30), election=election,
+        )
+        updater = StockPriceUpdater(shard=membership)
+
+        membership.heartbeat()
+        assignment = membership.report()
+        self.stdout.write(
+            f"Worker {worker_id} started with {len(membership.ring)} worker(s); "
+            f"owns {assignment.get(worker_id, 0)} of {sum(assignment.values())} symbols"
+        )
+
+        election.start()
+        updater.start()
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        try:
+            while not stop_event.wait(options['heartbeat']):
+                try:
+                    if membership.heartbeat():
+                        updater.wake()  # Pick up newly assigned symbols now
+                except Exception as e:
+                    self.stderr.write(f"Heartbeat failed: {str(e)}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            updater.stop()
+            election.stop()
+            membership.leave()
+            self.stdout.write(f"Worker {worker_id} stopped")
@@ -0,0 +1,176 @@
+# core/market_calendar.py
+import json
+import logging
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Regular sessions are (open, close) pairs in exchange local time, so a
+# lunch break is two sessions. Extended hours are None where not offered.
+Exchange = namedtuple('Exchange', 'timezone regular pre_market after_hours')
+
+EXCHANGES = {
+    'US': Exchange('America/New_York', [(time(9, 30), time(16))], time(4), time(20)),
+    'TSX': Exchange('America/Toronto', [(time(9, 30), time(16))], None, None),
+    'LSE': Exchange('Europe/London', [(time(8), time(16, 30))], None, None),
+    'XETRA': Exchange('Europe/Berlin', [(time(9), time(17, 30))], None, None),
+    'EURONEXT': Exchange('Europe/Paris', [(time(9), time(17, 30))], None, None),
+    'JPX': Exchange('Asia/Tokyo', [(time(9), time(11, 30)), (time(12, 30), time(15, 30))], None, None),
+    'HKEX': Exchange('Asia/Hong_Kong', [(time(9, 30), time(12)), (time(13), time(16))], None, None),
+}
+
+# Yahoo Finance symbol suffixes; anything else is treated as a US listing
+SUFFIXES = {
+    '.TO': 'TSX',
+    '.V': 'TSX',
+    '.L': 'LSE',
+    '.DE': 'XETRA',
+    '.PA': 'EURONEXT',
+    '.AS': 'EURONEXT',
+    '.T': 'JPX',
+    '.HK': 'HKEX',
+}
+
+ALWAYS_OPEN = 'CRYPTO'
+
+
+def exchange_for(symbol):
+    """Exchange a Yahoo Finance symbol trades on"""
+    symbol = symbol.upper()
+    if symbol.endswith('-USD'):
+        return ALWAYS_OPEN
+    dot = symbol.rfind('.')
+    if dot > 0:
+        return SUFFIXES.get(symbol[dot:], 'US')
+    return 'US'
+
+
+class MarketCalendar:
+    """
+    Knows when each exchange is trading.
+
+    Weekends and the holidays in the calendar file are closed all day;
+    early-close days end the regular session at the listed time and move
+    the end of after-hours trading forward by the same amount.
+    """
+
+    def __init__(self, holidays=None, extended_hours=True):
+        self.holidays = {}  # exchange -> {date: name}
+        self.early_closes = {}  # exchange -> {date: time}
+        for exchange, calendar in (holidays or {}).items():
+            self.holidays[exchange] = {
+                date.fromisoformat(day): name for day, name in calendar.get('holidays', {}).items()
+            }
+            self.early_closes[exchange] = {
+                date.fromisoformat(day): time.fromisoformat(close)
+                for day, close in calendar.get('early_closes', {}).items()
+            }
+        self.active = ('pre', 'regular', 'post') if extended_hours else ('regular',)
+
+    def sessions(self, exchange, day):
+        """(kind, start, end) for each session on a local date, in order"""
+        info = EXCHANGES[exchange]
+        if day.weekday() >= 5 or day in self.holidays.get(exchange, {}):
+            return []
+
+        tz = ZoneInfo(info.timezone)
+
+        def at(moment):
+            return datetime.combine(day, moment, tzinfo=tz)
+
+        regular = info.regular
+        after_hours = info.after_hours
+        early_close = self.early_closes.get(exchange, {}).get(day)
+        if early_close:
+            regular = [(start, min(end, early_close)) for start, end in regular if start < early_close]
+            if after_hours:
+                shift = datetime.combine(day, info.regular[-1][1]) - datetime.combine(day, early_close)
+                after_hours = (datetime.combine(day, after_hours) - shift).time()
+
+        result = []
+        if info.pre_market:
+            result.append(('pre', at(info.pre_market), at(regular[0][0])))
+        result.extend(('regular', at(start), at(end)) for start, end in regular)
+        if after_hours:
+            result.append(('post', at(regular[-1][1]), at(after_hours)))
+        return result
+
+    def session(self, symbol, when=None):
+        """'pre', 'regular', 'post' or 'closed' for a symbol's exchange"""
+        exchange = exchange_for(symbol)
+        if exchange == ALWAYS_OPEN:
+            return 'regular'
+        when = when or timezone.now()
+        local_day = when.astimezone(ZoneInfo(EXCHANGES[exchange].timezone)).date()
+        for kind, start, end in self.sessions(exchange, local_day):
+            if start <= when < end:
+                return kind
+        return 'closed'
+
+    def is_open(self, symbol, when=None):
+        """Whether quotes for a symbol are worth polling right now"""
+        return self.session(symbol, when) in self.active
+
+    def next_open(self, symbol, when=None):
+        """When polling a symbol should next resume; `when` itself if open now"""
+        when = when or timezone.now()
+        exchange = exchange_for(symbol)
+        if exchange == ALWAYS_OPEN:
+            return when
+        local_day = when.astimezone(ZoneInfo(EXCHANGES[exchange].timezone)).date()
+        for offset in range(15):
+            for kind, start, end in self.sessions(exchange, local_day + timedelta(days=offset)):
+                if kind in self.active and end > when:
+                    return max(start, when)
+        return None
+
+    def open_symbols(self, symbols, when=None):
+        """Symbols whose exchange is trading, checking each exchange once"""
+        when = when or timezone.now()
+        exchanges = {}
+        result = []
+        for symbol in symbols:
+            exchange = exchange_for(symbol)
+            if exchange not in exchanges:
+                exchanges[exchange] = self.is_open(symbol, when)
+            if exchanges[exchange]:
+                result.append(symbol)
+        return result
+
+    def seconds_until_open(self, symbols, when=None):
+        """Seconds until the first of the symbols' exchanges opens"""
+        when = when or timezone.now()
+        opens = {}
+        for symbol in symbols:
+            exchange = exchange_for(symbol)
+            if exchange not in opens:
+                opens[exchange] = self.next_open(symbol, when)
+        opens = [moment for moment in opens.values() if moment is not None]
+        if not opens:
+            return None
+        return max(0.0, (min(opens) - when).total_seconds())
+
+
+def load_holidays(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Market holiday file {path} not found, only weekends will be closed")
+        return {}
+
+
+@lru_cache(maxsize=None)
+def get_market_calendar():
+    config = getattr(settings, 'MARKET_CALENDAR', {})
+    holidays_file = config.get('HOLIDAYS_FILE')
+    return MarketCalendar(
+        holidays=load_holidays(holidays_file) if holidays_file else {},
+        extended_hours=config.get('EXTENDED_HOURS', True),
+    )
@@ -0,0 +1,318 @@
+# core/metrics.py
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metric:
+    """
+    A metric family with optional labels.
+
+    Values are either recorded as they happen (a lock and a dict update)
+    or read at scrape time by a `collect` callback returning
+    {label values tuple: value}, which costs the hot loop nothing.
+    """
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.lock = threading.Lock()
+        self.values = {}  # label values tuple -> value
+
+    def samples(self):
+        """(sample name, {label: value}, value) for every series"""
+        values = self.collect() if self.collect else dict(self.values)
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in values.items()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, *label_values):
+        with self.lock:
+            self.values[label_values] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+        samples = []
+        for key, (counts, total, count) in values.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", dict(labels, le=format_value(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.monotonic() - self.started, *self.label_values)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=(), collect=None):
+        return self.register(Counter(name, help, labels, collect))
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self.register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def families(self, extra_labels=None):
+        """JSON-friendly snapshot of every metric"""
+        families = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning(f"Error collecting metric {metric.name}: {str(e)}")
+                continue
+            if extra_labels:
+                samples = [(name, dict(labels, **extra_labels), value) for name, labels, value in samples]
+            families.append({'name': metric.name, 'type': metric.type, 'help': metric.help, 'samples': samples})
+        return families
+
+    def write_snapshot(self, directory, identity=PROCESS_ID):
+        """Publish this process's metrics for the /metrics view of other processes"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{identity.replace(':', '_')}.json")
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'instance': identity, 'families': self.families()}, f)
+        os.replace(temporary, path)
+
+
+def read_snapshots(directory, max_age, exclude=PROCESS_ID):
+    """Families from other processes' recent snapshots, labelled with their instance"""
+    families = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return families
+    now = time.time()
+    for name in names:
+        path = os.path.join(directory, name)
+        if not name.endswith('.json'):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                continue
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snapshot['instance'] == exclude:
+            continue
+        for family in snapshot['families']:
+            family['samples'] = [
+                (sample, dict(labels, instance=snapshot['instance']), value)
+                for sample, labels, value in family['samples']
+            ]
+            families.append(family)
+    return families
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families):
+    """Prometheus text exposition format, merging families that share a name"""
+    merged = {}
+    for family in families:
+        existing = merged.get(family['name'])
+        if existing is None:
+            merged[family['name']] = dict(family, samples=list(family['samples']))
+        else:
+            existing['samples'].extend(family['samples'])
+
+    lines = []
+    for family in merged.values():
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family['samples']:
+            if labels:
+                label_text = ','.join(f'{key}="{escape(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {format_value(value)}")
+            else:
+                lines.append(f"{name} {format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot_config():
+    config = getattr(settings, 'METRICS', {})
+    return (
+        config.get('SNAPSHOT_DIR') or os.path.join(settings.BASE_DIR, 'logs', 'metrics'),
+        config.get('SNAPSHOT_MAX_AGE', 300),
+    )
+
+
+registry = Registry()
+
+# Recorded as they happen
+provider_request_seconds = registry.histogram(
+    'stockwatch_provider_request_seconds', 'Provider request latency', ('kind',),
+)
+provider_errors = registry.counter(
+    'stockwatch_provider_errors_total', 'Symbols a provider request failed to return', ('symbol',),
+)
+cycle_seconds = registry.histogram(
+    'stockwatch_update_cycle_seconds', 'Duration of update cycles',
+)
+cycle_overruns = registry.counter(
+    'stockwatch_update_cycle_overruns_total', 'Update cycles that took longer than their interval',
+)
+flush_seconds = registry.histogram(
+    'stockwatch_db_flush_seconds', 'Time to write one batch of pending row changes',
+)
+alerts_fired = registry.counter(
+    'stockwatch_alerts_fired_total', 'Price targets that fired an alert', ('condition',),
+)
+report_render_seconds = registry.histogram(
+    'stockwatch_report_render_seconds', 'Time to render a financial report on a cache miss',
+)
+
+
+# Read at scrape time from counters the pipeline already keeps
+def _targets_evaluated():
+    from .target_index import target_index
+    return {(): target_index.evaluated}
+
+
+def _fetch_stats():
+    from .fetcher import get_fetch_engine
+    return get_fetch_engine().stats()
+
+
+def _outbox_stats():
+    from .outbox import outbox_sender
+    return outbox_sender.stats()
+
+
+def _quote_ages():
+    from .fetcher import get_fetch_engine
+    now = time.time()
+    return {(symbol,): round(now - fetched_at, 3) for symbol, fetched_at in get_fetch_engine().fetched_at.items()}
+
+
+def _cache_stats():
+    from .quote_cache import quote_cache
+    from .card_cache import card_cache
+    from .report_cache import report_cache
+    return quote_cache.stats(), report_cache.stats(), card_cache.stats()
+
+
+registry.counter('stockwatch_targets_evaluated_total', 'Price targets checked against a new price',
+                 collect=_targets_evaluated)
+registry.counter('stockwatch_provider_requests_total', 'Provider requests made',
+                 collect=lambda: {(): _fetch_stats()['requests']})
+registry.gauge('stockwatch_provider_requests_in_flight', 'Provider requests currently running',
+               collect=lambda: {(): _fetch_stats()['in_flight']})
+registry.counter('stockwatch_alerts_delivered_total', 'Alert emails delivered',
+                 collect=lambda: {(): _outbox_stats()['delivered']})
+registry.counter('stockwatch_alert_delivery_failures_total', 'Alert email send attempts that failed',
+                 collect=lambda: {(): _outbox_stats()['failures']})
+registry.gauge('stockwatch_quote_age_seconds', 'Seconds since each symbol was last fetched', ('symbol',),
+               collect=_quote_ages)
+registry.counter('stockwatch_quote_cache_hits_total', 'Quote cache hits',
+                 collect=lambda: {(): _cache_stats()[0]['hits']})
+registry.counter('stockwatch_quote_cache_misses_total', 'Quote cache misses',
+                 collect=lambda: {(): _cache_stats()[0]['misses']})
+registry.counter('stockwatch_report_cache_hits_total', 'Report cache hits',
+                 collect=lambda: {(): _cache_stats()[1]['hits']})
+registry.counter('stockwatch_report_cache_misses_total', 'Report cache misses',
+                 collect=lambda: {(): _cache_stats()[1]['misses']})
+registry.counter('stockwatch_report_not_modified_total', 'Report requests answered with 304 Not Modified',
+                 collect=lambda: {(): _cache_stats()[1]['not_modified']})
+registry.counter('stockwatch_card_cache_hits_total', 'Dashboard cards served from cache',
+                 collect=lambda: {(): _cache_stats()[2]['hits']})
+registry.counter('stockwatch_card_cache_misses_total', 'Dashboard cards rendered',
+                 collect=lambda: {(): _cache_stats()[2]['misses']})
+
+
+def database_families():
+    """Metrics read from the database, the same whichever process serves them"""
+    from django.db.models import Count
+    from .models import AlertOutbox
+
+    depth = dict(AlertOutbox.objects.order_by().values_list('status').annotate(count=Count('id')))
+    return [{
+        'name': 'stockwatch_outbox_alerts',
+        'type': 'gauge',
+        'help': 'Alerts in the outbox by status',
+        'samples': [
+            ('stockwatch_outbox_alerts', {'status': status}, depth.get(status, 0))
+            for status in ('pending', 'sent', 'failed')
+        ],
+    }]
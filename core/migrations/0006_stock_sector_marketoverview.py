@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_pricebar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='sector',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.CreateModel(
+            name='MarketOverview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('stock_count', models.PositiveIntegerField(default=0)),
+                ('advancers', models.PositiveIntegerField(default=0)),
+                ('decliners', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('average_change', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('total_market_cap', models.BigIntegerField(default=0)),
+                ('sectors', models.JSONField(default=dict)),
+                ('top_gainers', models.JSONField(default=list)),
+                ('top_losers', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_stock_sector_marketoverview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricetarget',
+            name='condition',
+            field=models.CharField(choices=[('price', 'Price'), ('price_ma20', 'Price crosses MA20'), ('ma5_ma20', 'MA5 crosses MA20'), ('rsi', 'RSI(14)')], default='price', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pricetarget_condition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('holder', models.CharField(max_length=200)),
+                ('expires_at', models.DateTimeField()),
+                ('renewed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_workerlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:30
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def fill_change_percentage(apps, schema_editor):
+    Stock = apps.get_model('core', 'Stock')
+    stocks = Stock.objects.exclude(previous_close=None).exclude(previous_close=0)
+    stocks = list(stocks.exclude(current_price=None).exclude(current_price=0))
+    for stock in stocks:
+        change = (stock.current_price - stock.previous_close) / stock.previous_close * 100
+        stock.change_percentage = change.quantize(Decimal('0.0001'))
+    Stock.objects.bulk_update(stocks, ['change_percentage'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_stock_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='change_percentage',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['change_percentage', 'id'], name='stock_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['volume', 'id'], name='stock_volume_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['market_cap', 'id'], name='stock_market_cap_idx'),
+        ),
+        migrations.RunPython(fill_change_percentage, migrations.RunPython.noop),
+    ]
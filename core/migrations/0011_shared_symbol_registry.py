@@ -0,0 +1,59 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_stocks(apps, schema_editor):
+    """Keep one upper-case row per symbol, moving targets onto it"""
+    Stock = apps.get_model('core', 'Stock')
+    PriceTarget = apps.get_model('core', 'PriceTarget')
+
+    keepers = {}
+    for stock in Stock.objects.order_by('id'):
+        symbol = stock.symbol.upper()
+        keeper = keepers.get(symbol)
+        if keeper is None:
+            keepers[symbol] = stock
+            if stock.symbol != symbol:
+                stock.symbol = symbol
+                stock.save(update_fields=['symbol'])
+            continue
+        PriceTarget.objects.filter(stock=stock).update(stock=keeper)
+        stock.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_stock_change_percentage'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stocks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stock',
+            name='symbol',
+            field=models.CharField(max_length=10, unique=True),
+        ),
+        migrations.AddField(
+            model_name='pricetarget',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='WatchlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watchers', to='core.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watchlist', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['stock__symbol'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'stock'), name='unique_watchlist_entry')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('origin', models.CharField(max_length=200)),
+                ('event', models.CharField(max_length=20)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+def mark_shared_stocks(apps, schema_editor):
+    """Stocks nobody watches, or with shared targets, came from the shared list"""
+    Stock = apps.get_model('core', 'Stock')
+    Stock.objects.filter(
+        models.Q(watchers__isnull=True) | models.Q(pricetarget__user__isnull=True, pricetarget__isnull=False)
+    ).update(shared=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_streamevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='shared',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_shared_stocks, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,20 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from decimal import Decimal
 
 class Stock(models.Model):
-    symbol = models.CharField(max_length=10, db_index=True)
+    """
+    A symbol in the shared registry.
+
+    There is one row per symbol however many users watch it, so the
+    updater fetches it once per cycle for all of them; who watches it is
+    recorded by WatchlistEntry rows, and `shared` marks it as added to the
+    shared list used without an account.
+    """
+    symbol = models.CharField(max_length=10, unique=True)
     name = models.CharField(max_length=100, null=True)
+    sector = models.CharField(max_length=100, null=True, blank=True)
     current_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     previous_close = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     market_cap = models.BigIntegerField(null=True)
@@ -11,13 +22,37 @@ class Stock(models.Model):
     day_high = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     day_low = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     last_updated = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped whenever the dashboard card for this stock would change
+    version = models.PositiveIntegerField(default=0)
+    # price_change_percentage stored at write time so the watchlist API can sort and filter on it
+    change_percentage = models.DecimalField(max_digits=10, decimal_places=4, default=Decimal('0'))
+    shared = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['symbol']
+        indexes = [
+            models.Index(fields=['change_percentage', 'id'], name='stock_change_idx'),
+            models.Index(fields=['volume', 'id'], name='stock_volume_idx'),
+            models.Index(fields=['market_cap', 'id'], name='stock_market_cap_idx'),
+        ]
 
     def __str__(self):
         return f"{self.symbol} - {self.name or 'N/A'}"
 
+    def save(self, *args, **kwargs):
+        self.update_change()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'change_percentage'}
+        super().save(*args, **kwargs)
+
+    def update_change(self):
+        """Recompute change_percentage and return whether it changed"""
+        change = self.price_change_percentage.quantize(Decimal('0.0001'))
+        if change == self.change_percentage:
+            return False
+        self.change_percentage = change
+        return True
+
     def price_change_abs(self):
         if self.current_price and self.previous_close:
             return abs(self.current_price - self.previous_close)
@@ -41,10 +76,19 @@ class PriceTarget(models.Model):
         ('below', 'Below'),
         ('exact', 'Exact'),
     ]
+    CONDITION_CHOICES = [
+        ('price', 'Price'),
+        ('price_ma20', 'Price crosses MA20'),
+        ('ma5_ma20', 'MA5 crosses MA20'),
+        ('rsi', 'RSI(14)'),
+    ]
 
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
-    price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Alerts go to this user's email; targets without a user alert NOTIFICATION_EMAIL
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # Price, or RSI threshold
     direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES)
+    condition = models.CharField(max_length=10, choices=CONDITION_CHOICES, default='price')
     is_active = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_triggered = models.DateTimeField(null=True, blank=True)
@@ -53,10 +97,12 @@ class PriceTarget(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
+        if self.condition != 'price':
+            return f"{self.stock.symbol} {self.get_condition_display()} {self.direction} {self.price}"
         return f"{self.stock.symbol} {self.direction} ${self.price}"
 
     def is_triggered(self, current_price):
-        if not current_price:
+        if not current_price or self.condition != 'price':
             return False
 
         if self.direction == 'above':
@@ -66,4 +112,151 @@ class PriceTarget(models.Model):
         else:  # exact
             # Using a small threshold for exact matches (within 0.1%)
             threshold = self.price * Decimal('0.001')
-            return abs(current_price - self.price) <= threshold
\ No newline at end of file
+            return abs(current_price - self.price) <= threshold
+
+
+class WatchlistEntry(models.Model):
+    """A user's subscription to a symbol in the shared Stock registry"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watchlist')
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='watchers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['stock__symbol']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'stock'], name='unique_watchlist_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} watches {self.stock.symbol}"
+
+
+class AlertOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    recipient = models.CharField(max_length=254)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+
+    @property
+    def delivery_latency(self):
+        if self.sent_at and self.created_at:
+            return (self.sent_at - self.created_at).total_seconds()
+        return None
+
+
+class PriceBar(models.Model):
+    """
+    One-minute OHLCV bar, appended by the updater and never modified.
+
+    Rows carry the symbol rather than a Stock foreign key so history
+    survives a stock being removed from the watchlist.
+    """
+    symbol = models.CharField(max_length=10)
+    timestamp = models.DateTimeField()  # Start of the minute
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.BigIntegerField(null=True)  # Shares traded during the bar
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'timestamp'], name='unique_price_bar'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.timestamp:%Y-%m-%d %H:%M} ${self.close}"
+
+
+class MarketOverview(models.Model):
+    """Watchlist-wide aggregates computed once per update cycle"""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    stock_count = models.PositiveIntegerField(default=0)
+    advancers = models.PositiveIntegerField(default=0)
+    decliners = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    average_change = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    total_market_cap = models.BigIntegerField(default=0)
+    sectors = models.JSONField(default=dict)  # sector -> {count, average_change}
+    top_gainers = models.JSONField(default=list)  # [{symbol, change_percentage}, ...]
+    top_losers = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Market overview {self.created_at:%Y-%m-%d %H:%M} ({self.advancers}/{self.decliners})"
+
+
+class WorkerLease(models.Model):
+    """
+    A named, expiring lease used to elect one process for a job.
+
+    Whoever holds an unexpired lease owns the job; the holder renews it
+    well before it expires, and any process may take it over once it has.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=200)
+    expires_at = models.DateTimeField()
+    renewed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at:%H:%M:%S}"
+
+
+class StreamEvent(models.Model):
+    """
+    A live event published by an updater, kept for a while so web
+    processes other than the updater's can relay it to their clients.
+    """
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    origin = models.CharField(max_length=200)  # PROCESS_ID of the publishing process
+    event = models.CharField(max_length=20)
+    data = models.JSONField()
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.event} from {self.origin} at {self.created_at:%H:%M:%S}"
+
+
+class Generation(models.Model):
+    """
+    A counter bumped whenever some shared state changes, so processes that
+    keep a copy of it in memory can tell when theirs is out of date.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} generation {self.value}"
+
+    @classmethod
+    def bump(cls, name):
+        """Advance a counter as part of the caller's transaction and return its new value"""
+        if cls.objects.filter(name=name).update(value=models.F('value') + 1):
+            return cls.current(name)
+        generation, created = cls.objects.get_or_create(name=name, defaults={'value': 1})
+        return generation.value if created else cls.bump(name)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
@@ -0,0 +1,170 @@
+# core/outbox.py
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .db_writer import get_write_queue
+from .models import AlertOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def build_alert(subject, message, recipient=None):
+    """Create an unsaved outbox row addressed to the notification email"""
+    return AlertOutbox(
+        subject=subject,
+        message=message,
+        recipient=recipient or settings.NOTIFICATION_EMAIL,
+    )
+
+
+class OutboxSender:
+    """
+    Background delivery of queued alert emails.
+
+    Pending AlertOutbox rows are sent over one authenticated SMTP
+    connection that stays open while there is work and is closed after
+    IDLE_TIMEOUT seconds without any. Failed sends are retried with
+    exponential backoff until MAX_ATTEMPTS is reached.
+    """
+
+    def __init__(self):
+        config = getattr(settings, 'ALERT_OUTBOX', {})
+        self.batch_size = config.get('BATCH_SIZE', 50)
+        self.poll_interval = config.get('POLL_INTERVAL', 5)
+        self.max_attempts = config.get('MAX_ATTEMPTS', 5)
+        self.retry_backoff = config.get('RETRY_BACKOFF', 30)
+        self.idle_timeout = config.get('IDLE_TIMEOUT', 60)
+
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.connection = None
+        self.last_sent = 0.0
+        self.delivered = 0
+        self.failures = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def wake(self):
+        """Deliver newly queued alerts without waiting for the next poll"""
+        self.wake_event.set()
+
+    def get_connection(self):
+        if self.connection is None:
+            self.connection = get_connection(
+                username=settings.GMAIL_EMAIL,
+                password=settings.GMAIL_APP_PASSWORD,
+            )
+        self.connection.open()
+        return self.connection
+
+    def close_connection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.warning(f"Error closing SMTP connection: {str(e)}")
+            self.connection = None
+
+    def deliver(self, alert, connection):
+        EmailMessage(
+            alert.subject,
+            alert.message,
+            settings.GMAIL_EMAIL,
+            [alert.recipient],
+            connection=connection,
+        ).send()
+
+    def send_pending(self):
+        """Send one batch of due alerts and return how many were delivered"""
+        due = list(
+            AlertOutbox.objects
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('created_at')[:self.batch_size]
+        )
+        if not due:
+            return 0
+
+        sent = 0
+        for alert in due:
+            alert.attempts += 1
+            try:
+                self.deliver(alert, self.get_connection())
+            except Exception as e:
+                # Drop the connection so the next attempt starts a fresh session
+                self.close_connection()
+                self.failures += 1
+                alert.last_error = str(e)
+                if alert.attempts >= self.max_attempts:
+                    alert.status = 'failed'
+                    logger.error(f"Giving up on alert {alert.id} after {alert.attempts} attempts: {str(e)}")
+                else:
+                    delay = self.retry_backoff * 2 ** (alert.attempts - 1)
+                    alert.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+                    logger.warning(f"Alert {alert.id} failed ({str(e)}), retrying in {delay}s")
+                get_write_queue().run(alert.save, update_fields=['attempts', 'status', 'next_attempt_at', 'last_error'])
+                continue
+
+            alert.status = 'sent'
+            alert.sent_at = timezone.now()
+            get_write_queue().run(alert.save, update_fields=['attempts', 'status', 'sent_at'])
+
+            latency = alert.delivery_latency
+            self.delivered += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.last_sent = time.monotonic()
+            sent += 1
+            logger.info(f"Alert email sent successfully: {alert.subject} ({latency:.2f}s after queueing)")
+
+        return sent
+
+    def stats(self):
+        return {
+            'delivered': self.delivered,
+            'failures': self.failures,
+            'latency_avg': self.latency_total / self.delivered if self.delivered else 0.0,
+            'latency_max': self.latency_max,
+        }
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.send_pending() >= self.batch_size:
+                    continue  # More may be waiting
+            except Exception as e:
+                logger.error(f"Error in outbox sender: {str(e)}")
+                self.close_connection()
+
+            if self.connection is not None and time.monotonic() - self.last_sent > self.idle_timeout:
+                self.close_connection()
+
+            self.wake_event.wait(self.poll_interval)
+            self.wake_event.clear()
+
+        self.close_connection()
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            logger.info("Starting alert outbox sender...")
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name='alert-outbox')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        logger.info("Stopping alert outbox sender...")
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+outbox_sender = OutboxSender()
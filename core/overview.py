@@ -0,0 +1,103 @@
+# core/overview.py
+import heapq
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import MarketOverview
+
+
+class OverviewAccumulator:
+    """
+    Builds a MarketOverview incrementally, one stock at a time.
+
+    Each stock costs a handful of additions plus a push onto two heaps
+    bounded at `top` entries, so the whole cycle stays linear and the
+    stored record is the same size however many stocks are watched.
+    """
+
+    def __init__(self, top=5):
+        self.top = top
+        self.count = 0
+        self.advancers = 0
+        self.decliners = 0
+        self.unchanged = 0
+        self.change_total = Decimal('0')
+        self.market_cap_total = 0
+        self.sectors = {}  # sector -> [count, change_total]
+        self.gainers = []  # min-heap of (change, symbol)
+        self.losers = []  # min-heap of (-change, symbol)
+
+    def add(self, stock):
+        if stock.current_price is None:
+            return
+        change = stock.price_change_percentage
+
+        self.count += 1
+        if change > 0:
+            self.advancers += 1
+        elif change < 0:
+            self.decliners += 1
+        else:
+            self.unchanged += 1
+        self.change_total += change
+        self.market_cap_total += stock.market_cap or 0
+
+        sector = self.sectors.setdefault(stock.sector or 'Unknown', [0, Decimal('0')])
+        sector[0] += 1
+        sector[1] += change
+
+        self._push(self.gainers, (change, stock.symbol))
+        self._push(self.losers, (-change, stock.symbol))
+
+    def _push(self, heap, item):
+        if len(heap) < self.top:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def build(self):
+        """Return an unsaved MarketOverview for everything added so far"""
+        two_places = Decimal('0.01')
+        return MarketOverview(
+            stock_count=self.count,
+            advancers=self.advancers,
+            decliners=self.decliners,
+            unchanged=self.unchanged,
+            average_change=(self.change_total / self.count if self.count else Decimal('0')).quantize(two_places),
+            total_market_cap=self.market_cap_total,
+            sectors={
+                name: {'count': count, 'average_change': float((total / count).quantize(two_places))}
+                for name, (count, total) in sorted(self.sectors.items())
+            },
+            top_gainers=[
+                {'symbol': symbol, 'change_percentage': float(change.quantize(two_places))}
+                for change, symbol in sorted(self.gainers, reverse=True) if change > 0
+            ],
+            top_losers=[
+                {'symbol': symbol, 'change_percentage': float((-change).quantize(two_places))}
+                for change, symbol in sorted(self.losers, reverse=True) if change > 0
+            ],
+        )
+
+
+def overview_data(overview):
+    """JSON-friendly form of a stored overview"""
+    return {
+        'created_at': overview.created_at.isoformat(),
+        'stock_count': overview.stock_count,
+        'advancers': overview.advancers,
+        'decliners': overview.decliners,
+        'unchanged': overview.unchanged,
+        'average_change': float(overview.average_change),
+        'total_market_cap': overview.total_market_cap,
+        'sectors': overview.sectors,
+        'top_gainers': overview.top_gainers,
+        'top_losers': overview.top_losers,
+    }
+
+
+def prune_overviews(days=7):
+    """Delete overview records older than `days` days"""
+    return MarketOverview.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
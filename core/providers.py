@@ -0,0 +1,348 @@
+# core/providers.py
+import json
+import logging
+import math
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+import yfinance as yf
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Number of trading days covered by the history periods the app asks for
+HISTORY_PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 21,
+    '3mo': 63,
+    '6mo': 126,
+    '1y': 252,
+}
+
+SYNTHETIC_SECTORS = [
+    'Technology', 'Healthcare', 'Financial Services', 'Energy',
+    'Consumer Cyclical', 'Industrials', 'Utilities',
+]
+
+
+class QuoteProviderError(Exception):
+    """Raised when a provider fails to serve a request"""
+
+
+def format_decimal(value):
+    """Format decimal to 2 places with proper rounding"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def optional_float(value):
+    return float(value) if value is not None else None
+
+
+class QuoteProvider:
+    """
+    Base class for market data sources.
+
+    Quotes are dicts with the same keys as the Stock model fields they
+    update (current_price, previous_close, market_cap, volume, day_high,
+    day_low, name, sector). Batched quotes may omit the slow-changing fields.
+    """
+
+    def get_quote(self, symbol):
+        """Return a full quote for one symbol, or None if unavailable"""
+        raise NotImplementedError
+
+    def get_quotes(self, symbols):
+        """Return a symbol -> quote mapping for one batch of symbols"""
+        quotes = {}
+        for symbol in symbols:
+            quote = self.get_quote(symbol)
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+
+    def get_info(self, symbol):
+        """Return the raw company/market info dict used by reports"""
+        raise NotImplementedError
+
+    def get_history(self, symbol, period='1mo'):
+        """Return a daily OHLCV DataFrame for the given period"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(QuoteProvider):
+    """Live quotes from Yahoo Finance"""
+
+    def get_quote(self, symbol):
+        try:
+            ticker = yf.Ticker(symbol)
+
+            # Get real-time price data
+            price_data = ticker.history(period='1d')
+            if price_data.empty:
+                logger.warning(f"No price data available for {symbol}")
+                return None
+
+            # Get general info
+            info = ticker.info
+            if not info:
+                logger.warning(f"No info available for {symbol}")
+                return None
+
+            return {
+                'current_price': format_decimal(price_data['Close'].iloc[-1]),
+                'previous_close': format_decimal(info.get('previousClose', 0)),
+                'market_cap': info.get('marketCap'),
+                'volume': info.get('volume', 0),
+                'day_high': format_decimal(price_data['High'].iloc[-1]),
+                'day_low': format_decimal(price_data['Low'].iloc[-1]),
+                'name': info.get('longName', symbol),
+                'sector': info.get('sector'),
+            }
+        except Exception as e:
+            logger.error(f"Error fetching info for {symbol}: {str(e)}")
+            return None
+
+    def get_quotes(self, symbols):
+        """Download recent daily bars for a batch in one request"""
+        data = yf.download(
+            symbols,
+            period='5d',
+            interval='1d',
+            group_by='ticker',
+            auto_adjust=False,
+            threads=False,
+            progress=False,
+        )
+        if data is None or data.empty:
+            return {}
+
+        multi_symbol = getattr(data.columns, 'nlevels', 1) > 1
+        quotes = {}
+        for symbol in symbols:
+            try:
+                if multi_symbol:
+                    if symbol not in data.columns.get_level_values(0):
+                        continue
+                    frame = data[symbol]
+                else:
+                    frame = data
+                frame = frame.dropna(subset=['Close'])
+                if frame.empty:
+                    logger.warning(f"No price data available for {symbol}")
+                    continue
+
+                latest = frame.iloc[-1]
+                quote = {
+                    'current_price': format_decimal(latest['Close']),
+                    'volume': 0 if math.isnan(latest['Volume']) else int(latest['Volume']),
+                    'day_high': format_decimal(latest['High']),
+                    'day_low': format_decimal(latest['Low']),
+                }
+                if len(frame) > 1:
+                    quote['previous_close'] = format_decimal(frame['Close'].iloc[-2])
+                quotes[symbol] = quote
+            except Exception as e:
+                logger.error(f"Error parsing batch data for {symbol}: {str(e)}")
+
+        return quotes
+
+    def get_info(self, symbol):
+        return yf.Ticker(symbol).info
+
+    def get_history(self, symbol, period='1mo'):
+        return yf.Ticker(symbol).history(period=period)
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Offline provider for load tests and benchmarks.
+
+    Serves recorded quotes from a JSON file, cycling through each symbol's
+    ticks on successive requests. Symbols missing from the file get a
+    synthetic random walk. Output depends only on the seed, the symbol and
+    how many times it has been requested, so runs are reproducible even
+    when requests are issued from several threads.
+
+    File format::
+
+        {
+            "AAPL": {
+                "info": {"longName": "Apple Inc.", "marketCap": 3000000000000},
+                "quotes": [
+                    {"current_price": "190.12", "previous_close": "188.25",
+                     "volume": 1000, "day_high": "191.00", "day_low": "189.00"}
+                ]
+            }
+        }
+    """
+
+    def __init__(self, path=None, latency=0.0, error_rate=0.0, seed=0, synthetic=True):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.synthetic = synthetic
+        self.recordings = {}
+        self._steps = {}
+        self._walk = {}
+        self._lock = threading.Lock()
+
+        if path:
+            with open(path) as f:
+                self.recordings = {symbol.upper(): data for symbol, data in json.load(f).items()}
+            logger.info(f"Loaded replay data for {len(self.recordings)} symbols from {path}")
+
+    def _rng(self, symbol, *parts):
+        key = ':'.join(str(part) for part in (self.seed, symbol) + parts)
+        return random.Random(zlib.crc32(key.encode()))
+
+    def _next_step(self, symbol):
+        with self._lock:
+            step = self._steps.get(symbol, 0)
+            self._steps[symbol] = step + 1
+        return step
+
+    def _request(self):
+        """Simulate the round trip cost of one provider request"""
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _check_error(self, symbol, step):
+        if self.error_rate and self._rng(symbol, 'error', step).random() < self.error_rate:
+            raise QuoteProviderError(f"Simulated provider error for {symbol}")
+
+    def _base_price(self, symbol):
+        return self._rng(symbol, 'base').uniform(5, 500)
+
+    def _synthetic_price(self, symbol, step):
+        """Deterministic random walk: price after `step` moves of up to 0.5%"""
+        with self._lock:
+            cached = self._walk.get(symbol)
+        if cached and cached[0] <= step:
+            start, price = cached
+        else:
+            start, price = 0, self._base_price(symbol)
+
+        for i in range(start, step):
+            price *= 1 + self._rng(symbol, 'walk', i).uniform(-0.005, 0.005)
+
+        with self._lock:
+            if symbol not in self._walk or self._walk[symbol][0] < step:
+                self._walk[symbol] = (step, price)
+        return price
+
+    def _quote(self, symbol, step):
+        symbol = symbol.upper()
+        self._check_error(symbol, step)
+
+        recording = self.recordings.get(symbol)
+        if recording and recording.get('quotes'):
+            ticks = recording['quotes']
+            quote = dict(ticks[step % len(ticks)])
+            info = recording.get('info', {})
+            quote.setdefault('name', info.get('longName', symbol))
+            quote.setdefault('sector', info.get('sector'))
+            quote.setdefault('market_cap', info.get('marketCap'))
+            for key in ('current_price', 'previous_close', 'day_high', 'day_low'):
+                if quote.get(key) is not None:
+                    quote[key] = format_decimal(quote[key])
+            return quote
+
+        if not self.synthetic:
+            return None
+
+        previous_close = self._base_price(symbol)
+        price = self._synthetic_price(symbol, step)
+        rng = self._rng(symbol, 'quote', step)
+        return {
+            'current_price': format_decimal(price),
+            'previous_close': format_decimal(previous_close),
+            'market_cap': int(previous_close * 1e8),
+            'volume': rng.randint(10_000, 5_000_000),
+            'day_high': format_decimal(max(price, previous_close) * 1.01),
+            'day_low': format_decimal(min(price, previous_close) * 0.99),
+            'name': f"{symbol} Synthetic Corp",
+            'sector': SYNTHETIC_SECTORS[self._rng(symbol, 'sector').randrange(len(SYNTHETIC_SECTORS))],
+        }
+
+    def get_quote(self, symbol):
+        self._request()
+        try:
+            return self._quote(symbol, self._next_step(symbol.upper()))
+        except QuoteProviderError as e:
+            logger.error(f"Error fetching info for {symbol}: {str(e)}")
+            return None
+
+    def get_quotes(self, symbols):
+        """Serve a whole batch for the cost of a single request"""
+        self._request()
+        quotes = {}
+        for symbol in symbols:
+            try:
+                quote = self._quote(symbol, self._next_step(symbol.upper()))
+            except QuoteProviderError as e:
+                logger.error(f"Error fetching info for {symbol}: {str(e)}")
+                continue
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+
+    def get_info(self, symbol):
+        quote = self.get_quote(symbol)
+        if not quote:
+            return {}
+        # Recorded quotes may leave fields out; Yahoo reports those as None too
+        info = {
+            'longName': quote.get('name'),
+            'sector': quote.get('sector'),
+            'currentPrice': optional_float(quote.get('current_price')),
+            'previousClose': optional_float(quote.get('previous_close')),
+            'open': optional_float(quote.get('previous_close')),
+            'dayLow': optional_float(quote.get('day_low')),
+            'dayHigh': optional_float(quote.get('day_high')),
+            'volume': quote.get('volume'),
+            'averageVolume': quote.get('volume'),
+            'marketCap': quote.get('market_cap') or 0,
+            'beta': 1.0,
+            'dividendYield': 0,
+        }
+        info.update(self.recordings.get(symbol.upper(), {}).get('info', {}))
+        return info
+
+    def get_history(self, symbol, period='1mo'):
+        import pandas as pd
+
+        symbol = symbol.upper()
+        self._request()
+        days = HISTORY_PERIOD_DAYS.get(period, 21)
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        closes = [self._synthetic_price(symbol, step) for step in range(days)]
+        return pd.DataFrame(
+            {
+                'Open': closes,
+                'High': [close * 1.01 for close in closes],
+                'Low': [close * 0.99 for close in closes],
+                'Close': closes,
+                'Volume': [self._rng(symbol, 'volume', step).randint(10_000, 5_000_000)
+                           for step in range(days)],
+            },
+            index=[today - timedelta(days=days - 1 - step) for step in range(days)],
+        )
+
+
+@lru_cache(maxsize=None)
+def get_provider():
+    """Return the process-wide provider configured in settings.QUOTE_PROVIDER"""
+    config = getattr(settings, 'QUOTE_PROVIDER', {})
+    backend = config.get('BACKEND', 'core.providers.YFinanceProvider')
+    provider = import_string(backend)(**config.get('OPTIONS', {}))
+    logger.info(f"Using quote provider {backend}")
+    return provider
@@ -0,0 +1,118 @@
+# core/quote_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Fields that change tick to tick; a batch quote carries only these
+PRICE_FIELDS = ('current_price', 'volume', 'day_high', 'day_low')
+QUOTE_FIELDS = PRICE_FIELDS + ('previous_close', 'market_cap', 'name', 'sector')
+
+DEFAULT_TTLS = {
+    'current_price': 30,
+    'volume': 30,
+    'day_high': 30,
+    'day_low': 30,
+    'previous_close': 3600,
+    'market_cap': 3600,
+    'name': 86400,
+    'sector': 86400,
+    'info': 300,  # raw provider info used by reports
+    'history': 3600,  # daily history used by reports
+}
+
+
+class QuoteCache:
+    """
+    Shared, size-bounded cache of per-symbol market data.
+
+    Every field expires on its own TTL, so a symbol's name and market cap
+    stay cached long after its price has gone stale. Symbols are evicted
+    least recently used first once `max_size` is reached.
+    """
+
+    def __init__(self, max_size=5000, ttls=None, default_ttl=60):
+        self.max_size = max_size
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # symbol -> {field: (value, expires_at)}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, symbol, values):
+        """Store fresh values for some or all of a symbol's fields"""
+        now = time.monotonic()
+        symbol = symbol.upper()
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is None:
+                entry = self.entries[symbol] = {}
+            self.entries.move_to_end(symbol)
+            for field, value in values.items():
+                entry[field] = (value, now + self.ttls.get(field, self.default_ttl))
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, symbol, fields=QUOTE_FIELDS):
+        """Return the requested fields if all are fresh, otherwise None"""
+        now = time.monotonic()
+        symbol = symbol.upper()
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is not None:
+                values = {}
+                for field in fields:
+                    cached = entry.get(field)
+                    if cached is None or cached[1] <= now:
+                        break
+                    values[field] = cached[0]
+                else:
+                    self.entries.move_to_end(symbol)
+                    self.hits += 1
+                    return values
+            self.misses += 1
+            return None
+
+    def get_or_load(self, symbol, field, loader):
+        """Return one cached field, calling loader() to refresh it when stale"""
+        cached = self.get(symbol, (field,))
+        if cached is not None:
+            return cached[field]
+        value = loader()
+        if value is not None:
+            self.put(symbol, {field: value})
+        return value
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _build_cache():
+    config = getattr(settings, 'QUOTE_CACHE', {})
+    return QuoteCache(
+        max_size=config.get('MAX_SIZE', 5000),
+        ttls=config.get('TTLS'),
+        default_ttl=config.get('DEFAULT_TTL', 60),
+    )
+
+
+quote_cache = _build_cache()
@@ -0,0 +1,97 @@
+# core/report_cache.py
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_http_date_safe
+
+from .metrics import report_render_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    Rendered financial reports cached per symbol and time bucket.
+
+    A report rendered during a bucket of `ttl` seconds is reused until the
+    bucket ends, with an ETag and Last-Modified time so clients can
+    revalidate instead of downloading the body again. The key includes the
+    watched stock's version, so a new quote from the updater starts a
+    fresh report straight away.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.renders = 0
+        self.render_total = 0.0
+        self.render_max = 0.0
+
+    def get_or_render(self, symbol, render, version=None):
+        """Return (entry, cache_hit); entry is None if render() returned None"""
+        now = time.time()
+        bucket = int(now // self.ttl)
+        key = f"report:{symbol}:{version or 0}:{bucket}"
+
+        entry = cache.get(key)
+        if entry is not None:
+            with self.lock:
+                self.hits += 1
+            return entry, True
+
+        started = time.monotonic()
+        report = render()
+        elapsed = time.monotonic() - started
+        report_render_seconds.observe(elapsed)
+        with self.lock:
+            self.misses += 1
+            self.renders += 1
+            self.render_total += elapsed
+            self.render_max = max(self.render_max, elapsed)
+        logger.info(f"Rendered report for {symbol} in {elapsed:.3f}s")
+
+        if report is None:
+            return None, False
+
+        entry = {
+            'report': report,
+            'etag': f'"{hashlib.md5(report.encode()).hexdigest()}"',
+            'last_modified': int(now),
+        }
+        cache.set(key, entry, timeout=max(1, int((bucket + 1) * self.ttl - now)))
+        return entry, False
+
+    def is_not_modified(self, request, entry):
+        """Whether the client's validators still match the cached report"""
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            matched = entry['etag'] in [tag.strip() for tag in if_none_match.split(',')]
+        else:
+            if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            matched = if_modified_since is not None and if_modified_since >= entry['last_modified']
+        if matched:
+            with self.lock:
+                self.not_modified += 1
+        return matched
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'render_avg': self.render_total / self.renders if self.renders else 0.0,
+                'render_max': self.render_max,
+            }
+
+
+report_cache = ReportCache(getattr(settings, 'REPORT_CACHE_SECONDS', 300))
@@ -0,0 +1,160 @@
+# core/scheduler.py
+import heapq
+import logging
+import math
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Decides which symbols to refresh on each tick of the update loop.
+
+    A symbol's next refresh is due after the time a random walk at its
+    recent volatility would need to cover a fraction (`safety`) of the
+    distance to its nearest uncrossed target, clamped between
+    `min_interval` and `max_interval`. Symbols without targets wait
+    `max_interval`; those whose distance or volatility is unknown wait
+    `base_interval`.
+
+    Each tick refreshes at most as many symbols as refreshing every
+    symbol once per `base_interval` would, taking the most overdue
+    first, so near-target symbols are paid for by far-away ones rather
+    than by extra provider requests.
+    """
+
+    def __init__(self, tick=15, base_interval=60, min_interval=15, max_interval=300,
+                 safety=0.25, decay=0.94, min_variance=1e-10):
+        self.tick = tick
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.safety = safety
+        self.decay = decay
+        self.min_variance = min_variance
+
+        self.heap = []  # (due_at, symbol), stale entries skipped when popped
+        self.next_due = {}  # symbol -> due_at
+        self.intervals = {}  # symbol -> last interval chosen
+        self.last_price = {}  # symbol -> (price, observed_at)
+        self.variance = {}  # symbol -> EWMA of squared log return per second
+
+        self.cycles = 0
+        self.overruns = 0
+        self.deferred = 0
+        self.max_lateness = 0.0
+        self.last_cycle = 0.0
+
+    def __len__(self):
+        return len(self.next_due)
+
+    def capacity(self, count):
+        """Symbols that may be refreshed per tick without exceeding the flat-rate budget"""
+        return max(1, math.ceil(count * self.tick / self.base_interval))
+
+    def due(self, symbols, now=None):
+        """Symbols to refresh this tick, new ones first and then most overdue"""
+        if now is None:
+            now = time.monotonic()
+        watched = set(symbols)
+        budget = self.capacity(len(watched))
+
+        selected = [symbol for symbol in watched if symbol not in self.next_due][:budget]
+        while self.heap and self.heap[0][0] <= now and len(selected) < budget:
+            due_at, symbol = heapq.heappop(self.heap)
+            if self.next_due.get(symbol) != due_at:
+                continue
+            if symbol not in watched:
+                self._forget(symbol)
+                continue
+            self.max_lateness = max(self.max_lateness, now - due_at)
+            selected.append(symbol)
+            del self.next_due[symbol]
+
+        deferred = sum(1 for due_at, symbol in self.heap if due_at <= now and self.next_due.get(symbol) == due_at)
+        if deferred:
+            self.deferred += deferred
+            logger.info(f"Refresh budget of {budget} reached, deferring {deferred} due symbols")
+        return selected
+
+    def _forget(self, symbol):
+        self.next_due.pop(symbol, None)
+        self.intervals.pop(symbol, None)
+        self.last_price.pop(symbol, None)
+        self.variance.pop(symbol, None)
+
+    def observe(self, symbol, price, now):
+        """Fold a new price into the symbol's volatility estimate"""
+        price = float(price)
+        previous = self.last_price.get(symbol)
+        self.last_price[symbol] = (price, now)
+        if previous is None or previous[0] <= 0 or now <= previous[1]:
+            return
+        rate = math.log(price / previous[0]) ** 2 / (now - previous[1])
+        variance = self.variance.get(symbol)
+        self.variance[symbol] = rate if variance is None else self.decay * variance + (1 - self.decay) * rate
+
+    def interval_for(self, symbol, distance, has_targets):
+        if not has_targets:
+            return self.max_interval
+        variance = self.variance.get(symbol)
+        if distance is None or variance is None:
+            return self.base_interval
+        # Expected seconds for a random walk to move `distance`
+        expected = distance ** 2 / max(variance, self.min_variance)
+        return min(max(self.safety * expected, self.min_interval), self.max_interval)
+
+    def schedule(self, symbol, price=None, distance=None, has_targets=False, now=None):
+        """Queue a refreshed symbol's next refresh"""
+        if now is None:
+            now = time.monotonic()
+        if price:
+            self.observe(symbol, price, now)
+        interval = self.interval_for(symbol, distance, has_targets)
+        due_at = now + interval
+        self.intervals[symbol] = interval
+        self.next_due[symbol] = due_at
+        heapq.heappush(self.heap, (due_at, symbol))
+
+        # Rebuild once stale entries dominate the heap
+        if len(self.heap) > 4 * len(self.next_due) + 64:
+            self.heap = [(due_at, symbol) for symbol, due_at in self.next_due.items()]
+            heapq.heapify(self.heap)
+
+    def finish_cycle(self, elapsed):
+        """Record how long a cycle took against its tick deadline"""
+        self.cycles += 1
+        self.last_cycle = elapsed
+        if elapsed > self.tick:
+            self.overruns += 1
+            logger.warning(f"Refresh cycle took {elapsed:.1f}s, overrunning its {self.tick}s deadline")
+
+    def stats(self):
+        intervals = self.intervals.values()
+        return {
+            'scheduled': len(self.next_due),
+            'fast': sum(1 for interval in intervals if interval < self.base_interval),
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'deferred': self.deferred,
+            'max_lateness': round(self.max_lateness, 2),
+            'last_cycle': round(self.last_cycle, 2),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_refresh_scheduler():
+    config = getattr(settings, 'REFRESH_SCHEDULER', {})
+    if not config.get('ENABLED', True):
+        return None
+    return RefreshScheduler(
+        tick=config.get('TICK', 15),
+        base_interval=config.get('BASE_INTERVAL', 60),
+        min_interval=config.get('MIN_INTERVAL', 15),
+        max_interval=config.get('MAX_INTERVAL', 300),
+        safety=config.get('SAFETY', 0.25),
+    )
@@ -0,0 +1,138 @@
+# core/sharding.py
+import hashlib
+import logging
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.db.models.functions import Now
+
+from .db_writer import get_write_queue
+from .leader import DatabaseLease
+from .models import Stock, WorkerLease
+
+logger = logging.getLogger(__name__)
+
+MEMBER_PREFIX = 'price-worker:'
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring with `replicas` virtual points per node.
+
+    Adding or removing a node only moves the keys on the arcs next to its
+    points, roughly 1/N of all keys, and every other key stays put.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self.points = []  # sorted ring hashes
+        self.owners = {}  # ring hash -> node
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = ring_hash(f"{node}#{replica}")
+            self.owners[point] = node
+        self.points = sorted(self.owners)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != node}
+        self.points = sorted(self.owners)
+
+    def node_for(self, key):
+        if not self.points:
+            return None
+        position = bisect_right(self.points, ring_hash(key)) % len(self.points)
+        return self.owners[self.points[position]]
+
+    def assignment(self, keys):
+        """node -> number of keys it owns"""
+        counts = dict.fromkeys(sorted(self.nodes), 0)
+        for key in keys:
+            counts[self.node_for(key)] += 1
+        return counts
+
+
+class ShardMembership:
+    """
+    This worker's share of the symbol universe.
+
+    Live workers are the unexpired `price-worker:<id>` leases; each
+    heartbeat renews this worker's own lease and rebuilds the ring when
+    membership changes. With a fixed `workers` list the ring is static
+    and no leases are used. The primary worker is the one holding the
+    leader election, if any, and writes the watchlist-wide records.
+    """
+
+    def __init__(self, worker_id, workers=None, ttl=30, election=None):
+        self.worker_id = worker_id
+        self.static = bool(workers)
+        self.ring = HashRing(workers or [worker_id])
+        self.lease = None if self.static else DatabaseLease(f"{MEMBER_PREFIX}{worker_id}", worker_id, ttl=ttl)
+        self.election = election
+
+    @property
+    def is_primary(self):
+        return self.election.is_leader if self.election else True
+
+    def owns(self, symbol):
+        return self.ring.node_for(symbol.upper()) == self.worker_id
+
+    def live_workers(self):
+        names = WorkerLease.objects.filter(
+            name__startswith=MEMBER_PREFIX, expires_at__gt=Now(),
+        ).values_list('name', flat=True)
+        return {name[len(MEMBER_PREFIX):] for name in names}
+
+    def heartbeat(self):
+        """Renew this worker's lease and pick up membership changes"""
+        if self.static:
+            return False
+        self.lease.acquire()
+        workers = self.live_workers() | {self.worker_id}
+        if workers == self.ring.nodes:
+            return False
+
+        for worker in self.ring.nodes - workers:
+            self.ring.remove(worker)
+        for worker in workers - self.ring.nodes:
+            self.ring.add(worker)
+        self.report()
+        return True
+
+    def report(self):
+        """Log how the current symbols are split across workers"""
+        symbols = {symbol.upper() for symbol in Stock.objects.values_list('symbol', flat=True)}
+        assignment = self.ring.assignment(symbols)
+        logger.info(
+            f"Worker {self.worker_id} owns {assignment.get(self.worker_id, 0)} of {len(symbols)} symbols; "
+            f"shards: {assignment}"
+        )
+        return assignment
+
+    def leave(self):
+        """Drop out of the ring so the other workers pick up this shard at once"""
+        get_write_queue().run(self._leave)
+
+    def _leave(self):
+        if self.lease is not None:
+            WorkerLease.objects.filter(name=self.lease.name, holder=self.worker_id).delete()
+        # Forget workers that have been gone for a while
+        WorkerLease.objects.filter(
+            name__startswith=MEMBER_PREFIX, expires_at__lt=Now() - timedelta(days=1),
+        ).delete()
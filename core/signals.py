@@ -0,0 +1,49 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Generation, PriceTarget, Stock
+from .target_index import GENERATION as TARGETS_GENERATION, target_index
+from .watchlist import GENERATION as STOCKS_GENERATION
+
+
+# Each change also bumps the targets generation: updaters in other processes
+# get no signal and reload when it moves, while this process's index records
+# the generations it applied itself and stays loaded
+
+@receiver(post_save, sender=PriceTarget)
+def index_saved_target(sender, instance, **kwargs):
+    generation = Generation.bump(TARGETS_GENERATION)
+    transaction.on_commit(lambda: target_index.update(instance, generation))
+
+
+@receiver(post_delete, sender=PriceTarget)
+def unindex_deleted_target(sender, instance, **kwargs):
+    target_id = instance.id
+    generation = Generation.bump(TARGETS_GENERATION)
+    transaction.on_commit(lambda: target_index.remove(target_id, generation))
+
+
+@receiver(post_save, sender=PriceTarget)
+@receiver(post_delete, sender=PriceTarget)
+def bump_card_version(sender, instance, **kwargs):
+    # Targets are shown on the stock's dashboard card
+    Stock.objects.filter(id=instance.stock_id).update(version=F('version') + 1)
+
+
+@receiver(post_delete, sender=Stock)
+def unindex_deleted_stock(sender, instance, **kwargs):
+    stock_id = instance.id
+    transaction.on_commit(lambda: target_index.remove_stock(stock_id))
+
+
+@receiver(post_save, sender=Stock)
+def wake_updater_for_new_stock(sender, instance, created, **kwargs):
+    if created:
+        # The updater may be idle until an exchange this stock doesn't trade on opens;
+        # one in another process notices the generation change instead
+        Generation.bump(STOCKS_GENERATION)
+        from .tasks import price_updater
+        transaction.on_commit(price_updater.wake)
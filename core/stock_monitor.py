@@ -1,90 +1,114 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import logging
-import yfinance as yf
-from decimal import Decimal, ROUND_HALF_UP
-from django.conf import settings
 import time
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.utils import timezone
+from .db_writer import get_write_queue
+from .db_writes import PendingWrites
+from .digest import AlertDigest
+from .events import event_hub, group_events, prune_events
+from .fetcher import FetchEngine, get_fetch_engine
+from .history import BarAggregator, recent_closes
+from .indicators import IndicatorBook
+from .metrics import alerts_fired
 from .models import Stock
+from .outbox import build_alert, outbox_sender
+from .overview import OverviewAccumulator, prune_overviews
+from .providers import format_decimal, get_provider
+from .target_index import target_index
 
 logger = logging.getLogger(__name__)
 
+DIRECTION_TEXT = {
+    'above': 'risen above',
+    'below': 'fallen below',
+    'exact': 'reached'
+}
+
+
+def describe_target(target):
+    """One-line description of why a target fired"""
+    if target.condition == 'price_ma20':
+        return f"The stock price has crossed {target.direction} its 20-period moving average"
+    if target.condition == 'ma5_ma20':
+        return f"The 5-period moving average has crossed {target.direction} the 20-period moving average"
+    if target.condition == 'rsi':
+        return f"RSI(14) has moved {target.direction} your threshold of {target.price}"
+    return f"The stock price has {DIRECTION_TEXT[target.direction]} your target of ${target.price}"
+
 
 class StockMonitor:
-    def __init__(self):
+    def __init__(self, provider=None, fetcher=None):
+        self.provider = provider or get_provider()
+        self.fetcher = fetcher or (FetchEngine(self.provider) if provider else get_fetch_engine())
         self.update_interval = 60  # seconds
         self.price_threshold = Decimal('0.001')  # 0.1% threshold for exact price matches
 
+        self.bars = BarAggregator()
+        self.indicators = IndicatorBook()
+        self.indicators_seeded = False
+        self.last_pruned = 0.0
+        self.last_timings = {}  # phase -> seconds taken in the last cycle
+        self.recipients = {}  # user id -> alert email, looked up once per cycle
+
+        digest_config = getattr(settings, 'ALERT_DIGEST', {})
+        self.digest = AlertDigest(digest_config.get('MAX_DELAY', 120)) if digest_config.get('ENABLED') else None
+
+    def reset_state(self):
+        """
+        Forget bars, indicators and targets held from earlier cycles. After
+        a spell without the leader lease they are behind what the other
+        leader wrote, so they are rebuilt from the database.
+        """
+        self.bars = BarAggregator()
+        self.indicators = IndicatorBook()
+        self.indicators_seeded = False
+        target_index.reset()
+
     def format_decimal(self, value):
         """Format decimal to 2 places with proper rounding"""
-        if not isinstance(value, Decimal):
-            value = Decimal(str(value))
-        return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return format_decimal(value)
 
     def get_stock_info(self, symbol):
         """Fetch comprehensive stock information"""
-        try:
-            ticker = yf.Ticker(symbol)
+        return self.fetcher.fetch_one(symbol)
 
-            # Get real-time price data
-            price_data = ticker.history(period='1d')
-            if price_data.empty:
-                logger.warning(f"No price data available for {symbol}")
-                return None
+    def get_batch_stock_info(self, symbols, refresh=False):
+        """Fetch latest quotes for many symbols in a few multi-symbol requests"""
+        return self.fetcher.fetch(symbols, refresh=refresh)
 
-            # Get general info
-            info = ticker.info
-            if not info:
-                logger.warning(f"No info available for {symbol}")
-                return None
-
-            return {
-                'current_price': self.format_decimal(price_data['Close'].iloc[-1]),
-                'previous_close': self.format_decimal(info.get('previousClose', 0)),
-                'market_cap': info.get('marketCap'),
-                'volume': info.get('volume', 0),
-                'day_high': self.format_decimal(price_data['High'].iloc[-1]),
-                'day_low': self.format_decimal(price_data['Low'].iloc[-1]),
-                'name': info.get('longName', symbol)
-            }
-        except Exception as e:
-            logger.error(f"Error fetching info for {symbol}: {str(e)}")
-            return None
+    def recipient_for(self, target):
+        """Alert address for a target: its owner's email, or NOTIFICATION_EMAIL for shared targets"""
+        if target.user_id is None:
+            return settings.NOTIFICATION_EMAIL
+        if target.user_id not in self.recipients:
+            email = get_user_model().objects.filter(id=target.user_id).values_list('email', flat=True).first()
+            self.recipients[target.user_id] = email or settings.NOTIFICATION_EMAIL
+        return self.recipients[target.user_id]
 
-    def send_gmail_alert(self, subject, message):
-        """Send email alert using Gmail SMTP"""
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = settings.GMAIL_EMAIL
-            msg['To'] = settings.NOTIFICATION_EMAIL
-            msg['Subject'] = subject
-            msg.attach(MIMEText(message, 'plain'))
-
-            with smtplib.SMTP('smtp.gmail.com', 587) as server:
-                server.starttls()
-                server.login(settings.GMAIL_EMAIL, settings.GMAIL_APP_PASSWORD)
-                server.send_message(msg)
-
-            logger.info(f"Alert email sent successfully: {subject}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send Gmail alert: {str(e)}")
-            return False
+    def queue_alert(self, subject, message, pending=None, recipient=None):
+        """Queue an alert email for the background outbox sender"""
+        if pending is not None:
+            pending.add_alert(build_alert(subject, message, recipient))
+        else:
+            get_write_queue().run(build_alert(subject, message, recipient).save)
+            outbox_sender.wake()
+        logger.info(f"Alert queued: {subject}")
+        return True
 
-    def send_alert(self, stock, target, current_price):
-        """Send formatted stock price alert"""
-        direction_text = {
-            'above': 'risen above',
-            'below': 'fallen below',
-            'exact': 'reached'
-        }
+    def send_alert(self, stock, target, current_price, pending=None):
+        """Queue formatted stock price alert, or add it to the cycle digest"""
+        if pending is not None and self.digest is not None:
+            self.digest.add(self.recipient_for(target), stock, target, current_price)
+            return True
 
         subject = f"🚨 StockWatch Alert: {stock.symbol}"
         message = (
             f"Stock Alert for {stock.symbol} ({stock.name})\n\n"
-            f"The stock price has {direction_text[target.direction]} your target of ${target.price}\n\n"
+            f"{describe_target(target)}\n\n"
             f"Current Price: ${current_price}\n"
             f"Previous Close: ${stock.previous_close}\n"
             f"Today's Range: ${stock.day_low} - ${stock.day_high}\n"
@@ -93,7 +117,7 @@ class StockMonitor:
             f"StockWatch - Your Market Monitor"
         )
 
-        return self.send_gmail_alert(subject, message)
+        return self.queue_alert(subject, message, pending, self.recipient_for(target))
 
     def is_target_triggered(self, target, current_price):
         """Check if a price target has been triggered"""
@@ -104,49 +128,186 @@ class StockMonitor:
         else:  # exact match
             return abs(current_price - target.price) <= (target.price * self.price_threshold)
 
-    def check_price_alerts(self, stock):
-        """Check if any price targets have been triggered for a stock"""
-        info = self.get_stock_info(stock.symbol)
+    def apply_quote(self, stock, info):
+        """Copy a quote onto a stock and return the names of fields that changed"""
+        changed = []
+        for key, value in info.items():
+            if getattr(stock, key) != value:
+                setattr(stock, key, value)
+                changed.append(key)
+        if changed:
+            if ('current_price' in changed or 'previous_close' in changed) and stock.update_change():
+                changed.append('change_percentage')
+            stock.last_updated = timezone.now()
+            # Incremented in the database so a concurrent target change isn't lost
+            stock.version = F('version') + 1
+            changed.extend(['last_updated', 'version'])
+        return changed
+
+    def check_price_alerts(self, stock, info=None, pending=None):
+        """
+        Check if any price targets have been triggered for a stock.
+
+        Row changes and queued alerts are added to `pending` when the caller
+        batches writes for a whole cycle, and written straight away otherwise.
+        """
+        if info is None:
+            info = self.get_stock_info(stock.symbol)
         if not info:
             return False
 
+        flush_now = pending is None
+        if flush_now:
+            pending = PendingWrites()
+
         # Update stock information
-        for key, value in info.items():
-            setattr(stock, key, value)
-        stock.last_updated = datetime.now()
-        stock.save()
+        changed = self.apply_quote(stock, info)
+        pending.add_stock(stock, changed)
+        indicators = None
+        if changed and not flush_now:
+            # Only the update cycle advances bars and indicators, once per new quote
+            self.bars.add(stock.symbol.upper(), stock.current_price, stock.volume)
+            indicators = self.indicators.update(stock.symbol.upper(), stock.current_price)
+        if 'current_price' in changed:
+            pending.add_event('price', {
+                'id': stock.id,
+                'symbol': stock.symbol,
+                'price': float(stock.current_price),
+                'change': float(stock.price_change),
+                'change_percentage': float(stock.price_change_percentage),
+            })
 
         current_price = info['current_price']
         alerts_sent = False
 
-        # Check all active price targets
-        for target in stock.pricetarget_set.filter(is_active=True):
-            if self.is_target_triggered(target, current_price):
-                # Don't send alerts more than once per hour for the same target
-                if (not target.last_triggered or
-                        (datetime.now() - target.last_triggered).total_seconds() > 3600):
-                    if self.send_alert(stock, target, current_price):
-                        target.last_triggered = datetime.now()
-                        target.save()
-                        alerts_sent = True
+        # Look up crossed targets in the in-memory index
+        triggered = target_index.triggered(stock.id, current_price)
+        if indicators is not None:
+            triggered += [
+                target for target in target_index.indicator_targets(stock.id)
+                if indicators.is_triggered(target.condition, target.direction, target.price)
+            ]
+
+        for target in triggered:
+            # Don't send alerts more than once per hour for the same target
+            if (not target.last_triggered or
+                    (timezone.now() - target.last_triggered).total_seconds() > 3600):
+                if self.send_alert(stock, target, current_price, pending):
+                    now = timezone.now()
+                    pending.add_trigger(target.id, now)
+                    pending.add_event('alert', {
+                        'id': stock.id,
+                        'symbol': stock.symbol,
+                        'direction': target.direction,
+                        'condition': target.condition,
+                        'target_price': float(target.price),
+                        'price': float(current_price),
+                    })
+                    target_index.mark_triggered(target.id, now)
+                    alerts_fired.inc(target.condition)
+                    alerts_sent = True
 
+        if flush_now:
+            self.flush(pending)
         return alerts_sent
 
-    def update_all_stocks(self):
-        """Update all stocks in database with latest information"""
+    def flush(self, pending):
+        """Write pending changes and hand any queued alerts to the sender"""
+        if self.digest:
+            for recipient, subject, message in self.digest.drain():
+                pending.add_alert(build_alert(subject, message, recipient))
+                logger.info(f"Alert digest queued: {subject}")
+        queued_alerts = len(pending.alerts)
+        pending.flush()
+        if queued_alerts:
+            outbox_sender.wake()
+        self.publish(pending.take_events())
+
+    def publish(self, events):
+        """Push written price changes and alerts to live dashboards"""
+        for event, data in group_events(events):
+            event_hub.publish(event, data)
+
+    def update_all_stocks(self, calendar=None, scheduler=None, shard=None):
+        """
+        Update every symbol in the registry with the latest quote.
+
+        Each symbol is fetched once however many users watch it, and its
+        price is checked against every watcher's targets.
+        """
         logger.info("Starting stock update cycle")
-        stocks = Stock.objects.all()
+        started = time.monotonic()
+        self.recipients = {}
+        target_index.refresh()
+        stocks = list(Stock.objects.all())
+        if not self.indicators_seeded:
+            self.indicators.seed(recent_closes([stock.symbol for stock in stocks]))
+            self.indicators_seeded = True
+        symbols = [stock.symbol for stock in stocks]
+        if shard:
+            symbols = [symbol for symbol in symbols if shard.owns(symbol)]
+        if calendar:
+            # Closed markets keep their last prices; only trading symbols are fetched
+            symbols = calendar.open_symbols(symbols)
+        if scheduler:
+            # The scheduler decides when a price is stale, so skip the quote cache
+            symbols = scheduler.due([symbol.upper() for symbol in symbols])
+        quotes = self.get_batch_stock_info(symbols, refresh=scheduler is not None)
+        fetched = {symbol.upper() for symbol in symbols}
+        fetched_at = time.monotonic()
+        pending = PendingWrites()
+        overview = OverviewAccumulator()
         updated_count = 0
 
         for stock in stocks:
+            if stock.symbol.upper() not in fetched:
+                overview.add(stock)
+                continue
+            info = quotes.get(stock.symbol.upper())
+            if not info:
+                logger.warning(f"No quote returned for {stock.symbol}, skipping")
+                overview.add(stock)  # Still counted, at its last known price
+                continue
             try:
-                logger.info(f"Checking {stock.symbol}")
-                if self.check_price_alerts(stock):
+                if self.check_price_alerts(stock, info, pending):
                     updated_count += 1
-                time.sleep(2)  # Rate limiting for API calls
+                overview.add(stock)
+                if self.digest and self.digest.is_due():
+                    self.flush(pending)
             except Exception as e:
                 logger.error(f"Error processing {stock.symbol}: {str(e)}")
                 continue
 
+        if scheduler:
+            for stock in stocks:
+                symbol = stock.symbol.upper()
+                if symbol in fetched:
+                    has_targets, distance = target_index.proximity(stock.id, stock.current_price)
+                    price = stock.current_price if symbol in quotes else None
+                    scheduler.schedule(symbol, price, distance, has_targets)
+
+        evaluated_at = time.monotonic()
+        pending.add_bars(self.bars.take_completed())
+        # With several workers only the primary writes the watchlist-wide overview
+        primary = shard is None or shard.is_primary
+        if primary:
+            pending.set_overview(overview.build())
+        try:
+            self.flush(pending)
+        except Exception as e:
+            logger.error(f"Error writing stock updates: {str(e)}")
+
+        written_at = time.monotonic()
+        self.last_timings = {
+            'fetch': fetched_at - started,
+            'evaluate': evaluated_at - fetched_at,
+            'write': written_at - evaluated_at,
+        }
+
+        if primary and time.monotonic() - self.last_pruned > 3600:
+            self.last_pruned = time.monotonic()
+            get_write_queue().run(prune_overviews)
+            get_write_queue().run(prune_events)
+
         logger.info(f"Completed stock update cycle. Updated {updated_count} stocks.")
-        return updated_count
\ No newline at end of file
+        return updated_count
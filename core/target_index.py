@@ -0,0 +1,231 @@
+# core/target_index.py
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+EXACT_THRESHOLD = Decimal('0.001')  # Same 0.1% band as PriceTarget.is_triggered
+GENERATION = 'targets'  # Generation bumped by every PriceTarget change
+
+
+class IndexedTarget:
+    """The parts of an active PriceTarget needed to evaluate it"""
+    __slots__ = ('id', 'stock_id', 'price', 'direction', 'condition', 'last_triggered', 'user_id')
+
+    def __init__(self, id, stock_id, price, direction, condition='price', last_triggered=None, user_id=None):
+        self.id = id
+        self.stock_id = stock_id
+        self.price = Decimal(str(price))
+        self.direction = direction
+        self.condition = condition
+        self.last_triggered = last_triggered
+        self.user_id = user_id  # whose email the alert goes to
+
+    @classmethod
+    def from_target(cls, target):
+        return cls(target.id, target.stock_id, target.price, target.direction,
+                   target.condition, target.last_triggered, target.user_id)
+
+    def __repr__(self):
+        return f"<IndexedTarget {self.id} {self.direction} ${self.price}>"
+
+
+class TargetIndex:
+    """
+    Process-wide index of active price targets.
+
+    For each stock, targets are kept in one list per direction sorted by
+    (price, id), so a new price finds every crossed "above"/"below" target
+    by bisection and every "exact" match by a range lookup. Indicator
+    targets are kept in a separate unsorted list per stock. The index is
+    loaded once and then kept current by the PriceTarget/Stock signals.
+    Signals only fire in the process that made the change, so refresh()
+    also compares the targets generation with the last one it applied and reloads
+    after a change made by another process.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._stocks = {}  # stock_id -> {direction: [(price, id), ...], 'indicator': [id, ...]}
+        self._targets = {}  # target id -> IndexedTarget
+        self.generation = None  # targets generation the loaded index reflects
+        self.evaluated = 0  # price targets checked by triggered(), for metrics
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded:
+                return
+            from .models import Generation, PriceTarget  # Import here to avoid circular import
+
+            # Read first, so a change committed during the load is picked up next refresh
+            self.generation = Generation.current(GENERATION)
+            for target in PriceTarget.objects.filter(is_active=True).only(
+                    'id', 'stock_id', 'price', 'direction', 'condition', 'last_triggered', 'user'):
+                self._insert(IndexedTarget.from_target(target))
+            self.loaded = True
+            logger.info(f"Loaded {len(self._targets)} active price targets into index")
+
+    def refresh(self):
+        """Forget the index if targets changed in ways it hasn't applied, e.g. in another process"""
+        if not self.loaded:
+            return
+        from .models import Generation
+
+        generation = Generation.current(GENERATION)
+        with self.lock:
+            if self.loaded and generation != self.generation:
+                logger.info("Price targets changed in another process, reloading index")
+                self.reset()
+
+    def _applied(self, generation):
+        # Caught up only if no change, e.g. from another process, came in between
+        if generation is not None and self.generation is not None and generation == self.generation + 1:
+            self.generation = generation
+
+    def reset(self):
+        """Forget every target so the next lookup reloads from the database"""
+        with self.lock:
+            self.loaded = False
+            self._stocks = {}
+            self._targets = {}
+
+    def _insert(self, entry):
+        self._targets[entry.id] = entry
+        lists = self._stocks.setdefault(entry.stock_id, {'above': [], 'below': [], 'exact': [], 'indicator': []})
+        if entry.condition != 'price':
+            lists['indicator'].append(entry.id)
+        else:
+            insort(lists[entry.direction], (entry.price, entry.id))
+
+    def _remove(self, target_id):
+        entry = self._targets.pop(target_id, None)
+        if entry is None:
+            return
+        lists = self._stocks.get(entry.stock_id)
+        if entry.condition != 'price':
+            lists['indicator'].remove(entry.id)
+        else:
+            prices = lists[entry.direction]
+            i = bisect_left(prices, (entry.price, entry.id))
+            if i < len(prices) and prices[i] == (entry.price, entry.id):
+                del prices[i]
+        if not any(lists.values()):
+            del self._stocks[entry.stock_id]
+
+    def update(self, target, generation=None):
+        """Add, move or drop a target after it was saved, as of targets `generation`"""
+        with self.lock:
+            if not self.loaded:
+                return
+            self._remove(target.id)
+            if target.is_active:
+                self._insert(IndexedTarget.from_target(target))
+            self._applied(generation)
+
+    def remove(self, target_id, generation=None):
+        with self.lock:
+            if self.loaded:
+                self._remove(target_id)
+                self._applied(generation)
+
+    def remove_stock(self, stock_id):
+        with self.lock:
+            lists = self._stocks.pop(stock_id, None)
+            if lists:
+                for target_id in lists.pop('indicator'):
+                    self._targets.pop(target_id, None)
+                for prices in lists.values():
+                    for _, target_id in prices:
+                        self._targets.pop(target_id, None)
+
+    def mark_triggered(self, target_id, when):
+        with self.lock:
+            entry = self._targets.get(target_id)
+            if entry is not None:
+                entry.last_triggered = when
+
+    def targets_for(self, stock_id):
+        """All indexed targets for a stock"""
+        self.ensure_loaded()
+        with self.lock:
+            lists = self._stocks.get(stock_id)
+            if not lists:
+                return []
+            targets = [self._targets[target_id] for target_id in lists['indicator']]
+            for direction in ('above', 'below', 'exact'):
+                targets.extend(self._targets[target_id] for _, target_id in lists[direction])
+            return targets
+
+    def indicator_targets(self, stock_id):
+        """Indicator-condition targets for a stock"""
+        self.ensure_loaded()
+        with self.lock:
+            lists = self._stocks.get(stock_id)
+            return [self._targets[target_id] for target_id in lists['indicator']] if lists else []
+
+    def proximity(self, stock_id, current_price):
+        """
+        (has_targets, distance) for a stock, where distance is the relative
+        gap to the nearest price target not yet crossed, or None if there
+        is no such target
+        """
+        self.ensure_loaded()
+        with self.lock:
+            lists = self._stocks.get(stock_id)
+            if not lists or not any(lists.values()):
+                return False, None
+            if not current_price:
+                return True, None
+            price = Decimal(str(current_price))
+
+            # Nearest uncrossed "above" target is just over the price, "below" just under it
+            candidates = []
+            position = bisect_right(lists['above'], (price, float('inf')))
+            if position < len(lists['above']):
+                candidates.append(lists['above'][position][0])
+            position = bisect_left(lists['below'], (price, -1))
+            if position > 0:
+                candidates.append(lists['below'][position - 1][0])
+            position = bisect_left(lists['exact'], (price, -1))
+            candidates.extend(target_price for target_price, _ in lists['exact'][max(position - 1, 0):position + 1])
+
+            if not candidates:
+                return True, None
+            return True, float(min(abs(target_price - price) for target_price in candidates) / price)
+
+    def triggered(self, stock_id, current_price):
+        """Targets crossed by current_price, found by bisection"""
+        if not current_price:
+            return []
+        self.ensure_loaded()
+        price = Decimal(str(current_price))
+
+        with self.lock:
+            lists = self._stocks.get(stock_id)
+            if not lists:
+                return []
+
+            self.evaluated += len(lists['above']) + len(lists['below']) + len(lists['exact'])
+
+            # above: target <= price, below: target >= price
+            above = lists['above'][:bisect_right(lists['above'], (price, float('inf')))]
+            below = lists['below'][bisect_left(lists['below'], (price, -1)):]
+
+            # exact: |price - target| <= target * threshold
+            exact_prices = lists['exact']
+            low = price / (1 + EXACT_THRESHOLD)
+            high = price / (1 - EXACT_THRESHOLD)
+            exact = [
+                (target_price, target_id) for target_price, target_id in
+                exact_prices[bisect_left(exact_prices, (low, -1)):
+                             bisect_right(exact_prices, (high, float('inf')))]
+                if abs(price - target_price) <= target_price * EXACT_THRESHOLD
+            ]
+
+            return [self._targets[target_id] for _, target_id in above + below + exact]
+
+
+target_index = TargetIndex()
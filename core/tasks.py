@@ -1,33 +1,132 @@
 # tasks.py
 import threading
 import time
+from django.conf import settings
+from .market_calendar import get_market_calendar
+from .metrics import cycle_overruns, cycle_seconds, registry, snapshot_config
+from .models import Generation, Stock
+from .quote_cache import quote_cache
+from .scheduler import get_refresh_scheduler
 from .stock_monitor import StockMonitor
+from .watchlist import GENERATION as STOCKS_GENERATION
 import logging
 
 logger = logging.getLogger(__name__)
 
 class StockPriceUpdater:
-    def __init__(self):
+    def __init__(self, shard=None):
+        self.shard = shard  # ShardMembership when running as one of several workers
         self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
         self.monitor = StockMonitor()
 
+        config = getattr(settings, 'MARKET_CALENDAR', {})
+        self.calendar = get_market_calendar() if config.get('ENABLED', True) else None
+        self.off_hours_interval = config.get('OFF_HOURS_INTERVAL', 0)
+        self.scheduler = get_refresh_scheduler()
+        self.poll_interval = getattr(settings, 'STATE_SYNC', {}).get('POLL_SECONDS', 2)
+
+    def wake(self):
+        """Re-check the market calendar now, e.g. after a stock is added while idle"""
+        self.wake_event.set()
+
+    def stocks_generation(self):
+        try:
+            return Generation.current(STOCKS_GENERATION)
+        except Exception as e:
+            logger.warning(f"Error reading watchlist generation: {str(e)}")
+            return None
+
+    def run_cycle(self):
+        """Run one update if any market is trading; return seconds until the next"""
+        started = time.monotonic()
+        symbols = list(Stock.objects.values_list('symbol', flat=True))
+        if self.shard:
+            symbols = [symbol for symbol in symbols if self.shard.owns(symbol)]
+        if self.calendar is None or not symbols or self.calendar.open_symbols(symbols):
+            self.monitor.update_all_stocks(calendar=self.calendar, scheduler=self.scheduler, shard=self.shard)
+            elapsed = time.monotonic() - started
+            cycle_seconds.observe(elapsed)
+            if elapsed > (self.scheduler.tick if self.scheduler else self.monitor.update_interval):
+                cycle_overruns.inc()
+            logger.info(f"Fetch stats: {self.monitor.fetcher.stats()}")
+            logger.info(f"Quote cache stats: {quote_cache.stats()}")
+            if self.scheduler:
+                self.scheduler.finish_cycle(elapsed)
+                logger.info(f"Refresh scheduler stats: {self.scheduler.stats()}")
+                return max(0, self.scheduler.tick - elapsed)
+            # Check every minute, counting the time the cycle itself took
+            return max(0, self.monitor.update_interval - elapsed)
+
+        until_open = self.calendar.seconds_until_open(symbols)
+        if self.off_hours_interval and (until_open is None or until_open > self.off_hours_interval):
+            # Low-frequency refresh of every symbol while markets are closed
+            self.monitor.update_all_stocks(shard=self.shard)
+            until_open = self.calendar.seconds_until_open(symbols)
+            delay = self.off_hours_interval if until_open is None else min(until_open, self.off_hours_interval)
+        else:
+            delay = until_open if until_open is not None else self.monitor.update_interval
+        logger.info(f"All watched markets closed, next update in {delay:.0f}s")
+        return delay
+
     def update_prices(self):
         while not self.stop_event.is_set():
+            delay = self.monitor.update_interval
+            # Read before the cycle, so a stock added during it still ends the wait
+            generation = self.stocks_generation()
             try:
-                self.monitor.update_all_stocks()
-                time.sleep(60)  # Check every minute
+                delay = self.run_cycle()
             except Exception as e:
                 logger.error(f"Error in update loop: {str(e)}")
-                time.sleep(60)
+            self.wait(delay, generation)
+            self.wake_event.clear()
+
+    def wait(self, delay, generation):
+        """
+        Sleep `delay` seconds, or until woken or a stock is added in another
+        process, keeping the metrics snapshot fresh while idling until a
+        market opens
+        """
+        resume_at = time.monotonic() + delay
+        metrics_at = 0.0
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if now >= metrics_at:
+                self.write_metrics()
+                metrics_at = now + 60
+            remaining = resume_at - now
+            if remaining <= 0 or self.wake_event.wait(min(remaining, self.poll_interval)):
+                return
+            if self.stocks_generation() != generation:
+                logger.info("Stocks were added in another process, updating now")
+                return
+
+    def write_metrics(self):
+        """Let /metrics in any web process report this updater"""
+        try:
+            registry.write_snapshot(snapshot_config()[0])
+        except OSError as e:
+            logger.warning(f"Error writing metrics snapshot: {str(e)}")
 
     def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            if not self.stop_event.is_set():
+                return
+            self.thread.join()  # Let a stopping cycle finish before starting over
         logger.info("Starting stock price updater...")
-        thread = threading.Thread(target=self.update_prices)
-        thread.daemon = True
-        thread.start()
+        # Another process may have been updating since this one last ran
+        self.monitor.reset_state()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.update_prices, name='price-updater')
+        self.thread.daemon = True
+        self.thread.start()
 
     def stop(self):
         logger.info("Stopping stock price updater...")
         self.stop_event.set()
+        self.wake_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
 
 price_updater = StockPriceUpdater()
\ No newline at end of file
@@ -2,47 +2,858 @@ from django.test import TestCase
 
 # Create your tests here.
 # core/tests.py
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
 from django.core import mail
-from .models import Stock, PriceTarget
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.utils import timezone
+from .apps import runs_management_command
+from .benchmark import compare, run_scenario
+from .card_cache import CardCache
+from .db_writer import WriteQueue, get_write_queue
+from .db_writes import PendingWrites
+from .digest import AlertDigest
+from .events import EventHub, EventRelay
+from .fetcher import FetchEngine, TokenBucket
+from .indicators import IndicatorState
+from .leader import LeaderElection
+from .logging_utils import LazyJSON, RateLimitFilter
+from .market_calendar import MarketCalendar
+from .metrics import PROCESS_ID, Registry, registry, render
+from .models import AlertOutbox, Stock, PriceTarget, StreamEvent
+from .outbox import OutboxSender, build_alert
+from .overview import OverviewAccumulator
+from .providers import ReplayProvider, get_provider
+from .quote_cache import QuoteCache
+from .report_cache import ReportCache
+from .scheduler import RefreshScheduler
+from .sharding import HashRing
+from .stock_monitor import StockMonitor
 from .tasks import StockPriceUpdater
-from datetime import datetime
+from .target_index import TargetIndex, target_index
+from .watchlist import add_to_watchlist, remove_from_watchlist, watched_stocks, watchlist_page
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import json
+import logging
+import os
+import tempfile
+import time
+import threading
 
 
+@override_settings(NOTIFICATION_EMAIL='alerts@example.com')
 class StockAlertTest(TestCase):
     def setUp(self):
         # Create test stock
         self.stock = Stock.objects.create(
             symbol='AAPL',
             name='Apple Inc.',
-            current_price=180.00
+            current_price=Decimal('180.00'),
+            previous_close=Decimal('185.00'),
         )
 
         # Create price target
         self.target = PriceTarget.objects.create(
             stock=self.stock,
-            price=190.00,
+            price=Decimal('190.00'),
             direction='above'
         )
+        target_index.reset()
 
     def test_price_alert(self):
-        updater = StockPriceUpdater()
+        monitor = StockMonitor(provider=ReplayProvider())
         # Simulate price change that triggers alert
-        new_price = 191.45
-        updater.send_alert(self.stock.symbol, new_price, self.target.price, self.target.direction)
+        quote = {'current_price': Decimal('191.45'), 'day_high': Decimal('192.00'), 'day_low': Decimal('180.00')}
+        self.assertTrue(monitor.check_price_alerts(self.stock, quote))
 
-        # Check if email was sent
+        # The alert is queued in the outbox, then delivered by the sender
+        self.assertEqual(AlertOutbox.objects.filter(status='pending').count(), 1)
+        self.assertEqual(OutboxSender().send_pending(), 1)
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
 
-        expected_subject = "🚨 Stock Alert: AAPL"
-        self.assertEqual(email.subject, expected_subject)
+        self.assertEqual(email.subject, "🚨 StockWatch Alert: AAPL")
+        self.assertEqual(email.to, ['alerts@example.com'])
+        self.assertIn("risen above your target of $190.00", email.body)
+        self.assertIsNotNone(PriceTarget.objects.get(id=self.target.id).last_triggered)
+
+        # Within the hour the same target stays quiet
+        self.assertFalse(monitor.check_price_alerts(self.stock, quote))
+
+
+class PendingWritesTest(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.',
+                                          current_price=Decimal('180.00'), previous_close=Decimal('185.00'))
+        self.monitor = StockMonitor(provider=ReplayProvider())
+
+    def test_unchanged_quote_writes_nothing(self):
+        pending = PendingWrites()
+        quote = {'current_price': Decimal('180.00'), 'previous_close': Decimal('185.00')}
+        pending.add_stock(self.stock, self.monitor.apply_quote(self.stock, quote))
+
+        self.assertEqual(len(pending), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(pending.flush(), 0)
+
+    def test_only_changed_fields_are_written(self):
+        pending = PendingWrites()
+        quote = {'current_price': Decimal('182.00'), 'previous_close': Decimal('185.00')}
+        pending.add_stock(self.stock, self.monitor.apply_quote(self.stock, quote))
+
+        self.assertEqual(list(pending.stocks), [frozenset(
+            ['current_price', 'change_percentage', 'last_updated', 'version'])])
+        self.assertEqual(pending.flush(), 1)
+        stock = Stock.objects.get(id=self.stock.id)
+        self.assertEqual(stock.current_price, Decimal('182.00'))
+        self.assertEqual(stock.version, 1)
+
+
+class FailingSender(OutboxSender):
+    def deliver(self, alert, connection):
+        raise ConnectionError("SMTP unavailable")
+
+
+@override_settings(NOTIFICATION_EMAIL='alerts@example.com',
+                   ALERT_OUTBOX={'MAX_ATTEMPTS': 3, 'RETRY_BACKOFF': 30})
+class OutboxSenderTest(TestCase):
+    def setUp(self):
+        self.alert = build_alert("Subject", "Message")
+        self.alert.save()
+
+    def make_due(self):
+        AlertOutbox.objects.filter(id=self.alert.id).update(next_attempt_at=timezone.now())
+
+    def test_failures_back_off_exponentially(self):
+        sender = FailingSender()
+        for attempt, delay in [(1, 30), (2, 60)]:
+            started = timezone.now()
+            self.assertEqual(sender.send_pending(), 0)
+            alert = AlertOutbox.objects.get(id=self.alert.id)
+            self.assertEqual(alert.attempts, attempt)
+            self.assertEqual(alert.status, 'pending')
+            self.assertEqual(alert.last_error, "SMTP unavailable")
+            self.assertAlmostEqual((alert.next_attempt_at - started).total_seconds(), delay, delta=5)
+            # Not retried before the backoff runs out
+            self.assertEqual(sender.send_pending(), 0)
+            self.assertEqual(AlertOutbox.objects.get(id=self.alert.id).attempts, attempt)
+            self.make_due()
+
+        self.assertEqual(sender.send_pending(), 0)
+        self.assertEqual(AlertOutbox.objects.get(id=self.alert.id).status, 'failed')
+        self.assertEqual(sender.stats()['failures'], 3)
+
+    def test_retry_delivers_after_failure(self):
+        FailingSender().send_pending()
+        self.make_due()
+
+        sender = OutboxSender()
+        self.assertEqual(sender.send_pending(), 1)
+        alert = AlertOutbox.objects.get(id=self.alert.id)
+        self.assertEqual((alert.status, alert.attempts), ('sent', 2))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(sender.stats()['delivered'], 1)
+
+
+@override_settings(QUOTE_PROVIDER={'BACKEND': 'core.providers.ReplayProvider'})
+class ReportCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_provider.cache_clear()
+        self.addCleanup(get_provider.cache_clear)
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple Inc.',
+                                          current_price=Decimal('180.00'), previous_close=Decimal('185.00'))
+
+    def post(self, **headers):
+        return self.client.post('/generate-report/', {'topic': 'aapl'}, content_type='application/json', **headers)
+
+    def test_cached_until_price_changes(self):
+        first = self.post()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-Report-Cache'], 'miss')
+        self.assertIn("Current Price: $180.0", first.json()['report'])
+
+        second = self.post()
+        self.assertEqual(second['X-Report-Cache'], 'hit')
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['report'], first.json()['report'])
+
+        revalidated = self.post(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['X-Report-Cache'], 'hit')
+
+        StockMonitor(provider=ReplayProvider()).check_price_alerts(self.stock, {'current_price': Decimal('191.00')})
+
+        updated = self.post(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(updated['X-Report-Cache'], 'miss')
+        self.assertNotEqual(updated['ETag'], first['ETag'])
+        self.assertIn("Current Price: $191.0", updated.json()['report'])
+
+    def test_unknown_symbol_is_an_error(self):
+        with override_settings(QUOTE_PROVIDER={'BACKEND': 'core.providers.ReplayProvider',
+                                               'OPTIONS': {'synthetic': False}}):
+            get_provider.cache_clear()
+            response = self.client.post('/generate-report/', {'topic': 'NOPE'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(NOTIFICATION_EMAIL='alerts@example.com')
+class BenchmarkTest(TestCase):
+    def test_scenario_reports_phases(self):
+        result = run_scenario(10, 2, cycles=3)
+
+        self.assertEqual(result['symbols'], 10)
+        self.assertEqual(set(result['latency']), {'fetch', 'evaluate', 'write', 'dispatch', 'total'})
+        self.assertGreater(result['queries_per_cycle'], 0)
+        self.assertEqual(Stock.objects.count(), 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'s': {'symbols_per_second': 1000, 'queries_per_cycle': 10,
+                          'latency': {'total': {'p50': 0.1, 'p99': 0.2}}}}
+        current = {'s': {'symbols_per_second': 500, 'queries_per_cycle': 12,
+                         'latency': {'total': {'p50': 0.1, 'p99': 0.4}}}}
+        self.assertEqual(len(compare(current, baseline)), 3)
+        self.assertEqual(compare(baseline, baseline), [])
+
+    def test_missing_baseline_fails(self):
+        with self.assertRaisesMessage(CommandError, "No baseline"):
+            call_command('benchmark_updates', baseline=os.path.join(tempfile.gettempdir(), 'missing-baseline.json'))
+
+
+class CardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cards = CardCache()
+        self.apple = Stock.objects.create(symbol='AAPL', name='Apple Inc.', current_price=Decimal('180.00'))
+        Stock.objects.create(symbol='MSFT', name='Microsoft', current_price=Decimal('400.00'))
+
+    def test_only_changed_cards_are_rendered(self):
+        self.assertEqual(len(self.cards.cards()), 2)
+        self.assertEqual(self.cards.cards()[0], self.cards.cards()[0])
+        self.assertEqual(self.cards.stats()['misses'], 2)
+
+        monitor = StockMonitor(provider=ReplayProvider())
+        monitor.check_price_alerts(self.apple, {'current_price': Decimal('181.50')})
+        self.assertIn('181.50', self.cards.cards()[0])
+        self.assertEqual(self.cards.stats()['misses'], 3)
+
+        PriceTarget.objects.create(stock=self.apple, price=Decimal('195.00'), direction='above')
+        self.assertIn('above $195.00', self.cards.cards()[0])
+        self.assertEqual(self.cards.stats()['misses'], 4)
+
+    def test_large_watchlist_stays_cached(self):
+        Stock.objects.bulk_create(
+            Stock(symbol=f"SYM{i:04d}", current_price=Decimal('10.00')) for i in range(1000)
+        )
+        self.assertEqual(len(self.cards.cards()), 1002)
+
+        self.assertEqual(len(self.cards.cards()), 1002)
+        self.assertEqual(self.cards.stats()['misses'], 1002)
+
+
+class WatchlistTest(TestCase):
+    def setUp(self):
+        for symbol, price, volume in [('AAPL', '190.00', 5000), ('AMZN', '95.00', None),
+                                      ('AMD', '104.00', 9000), ('MSFT', '400.00', 7000)]:
+            Stock.objects.create(symbol=symbol, name=symbol, current_price=Decimal(price),
+                                 previous_close=Decimal('100.00'), volume=volume)
+
+    def pages(self, **params):
+        symbols, cursor = [], None
+        while True:
+            page = watchlist_page(dict(params, limit=1, cursor=cursor))
+            symbols.extend(stock['symbol'] for stock in page['stocks'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return symbols
+
+    def test_sorts_and_pages_by_stored_change(self):
+        self.assertEqual(Stock.objects.get(symbol='AMZN').change_percentage, Decimal('-5'))
+        self.assertEqual(self.pages(sort='-change_percentage'), ['MSFT', 'AAPL', 'AMD', 'AMZN'])
+        self.assertEqual(self.pages(sort='-volume'), ['AMD', 'MSFT', 'AAPL', 'AMZN'])
+
+    def test_prefix_search_and_filters(self):
+        self.assertEqual(self.pages(q='am'), ['AMD', 'AMZN'])
+        self.assertEqual(self.pages(min_change='0', max_change='100'), ['AAPL', 'AMD'])
+        with self.assertRaises(ValueError):
+            watchlist_page({'sort': 'price_change_percentage'})
+
+
+@override_settings(NOTIFICATION_EMAIL='alerts@example.com')
+class SharedRegistryTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+        target_index.reset()
+
+    def test_one_row_per_symbol_with_alerts_for_every_watcher(self):
+        stock, added = add_to_watchlist('aapl', self.alice, {'name': 'Apple Inc.', 'current_price': Decimal('180.00')})
+        self.assertTrue(added)
+        self.assertEqual(add_to_watchlist('AAPL', self.bob), (stock, True))
+        self.assertEqual(Stock.objects.count(), 1)
+        for user in (self.alice, self.bob, None):
+            PriceTarget.objects.create(stock=stock, user=user, price=Decimal('190.00'), direction='above')
+
+        monitor = StockMonitor(provider=ReplayProvider())
+        self.assertTrue(monitor.check_price_alerts(stock, {'current_price': Decimal('191.00')}))
+        self.assertEqual(
+            sorted(AlertOutbox.objects.values_list('recipient', flat=True)),
+            ['alerts@example.com', 'alice@example.com', 'bob@example.com'],
+        )
+
+    def test_stock_leaves_registry_with_its_last_watcher(self):
+        stock, _ = add_to_watchlist('MSFT', self.alice, {'current_price': Decimal('400.00')})
+        add_to_watchlist('MSFT', self.bob)
+
+        self.assertFalse(remove_from_watchlist(stock, self.alice))
+        self.assertFalse(watched_stocks(self.alice).exists())
+        self.assertTrue(watched_stocks(self.bob).exists())
+        self.assertTrue(remove_from_watchlist(stock, self.bob))
+        self.assertFalse(Stock.objects.exists())
+
+    def test_shared_list_keeps_stock_a_user_removes(self):
+        stock, added = add_to_watchlist('AAPL', quote={'current_price': Decimal('180.00')})
+        self.assertTrue(added)
+        self.assertEqual(add_to_watchlist('AAPL', self.alice), (stock, True))
+
+        self.assertFalse(remove_from_watchlist(stock, self.alice))
+        self.assertEqual(list(watched_stocks()), [stock])
+        self.assertFalse(watched_stocks(self.alice).exists())
+
+        self.assertTrue(remove_from_watchlist(stock))
+        self.assertFalse(Stock.objects.exists())
+
+    def test_shared_targets_keep_stock_in_registry(self):
+        stock, _ = add_to_watchlist('MSFT', self.alice, {'current_price': Decimal('400.00')})
+        PriceTarget.objects.create(stock=stock, user=self.alice, price=Decimal('410.00'), direction='above')
+        shared = PriceTarget.objects.create(stock=stock, price=Decimal('390.00'), direction='below')
+
+        self.assertFalse(remove_from_watchlist(stock, self.alice))
+        self.assertEqual(list(PriceTarget.objects.all()), [shared])
+        self.assertTrue(watched_stocks().filter(id=stock.id).exists())
+
+        # Removed from the shared list, its targets go with it
+        self.assertTrue(remove_from_watchlist(stock))
+        self.assertFalse(Stock.objects.exists())
+        self.assertFalse(PriceTarget.objects.exists())
+
+    def test_shared_list_keeps_stocks_users_watch(self):
+        stock, _ = add_to_watchlist('MSFT', self.alice, {'current_price': Decimal('400.00')})
+        shared = PriceTarget.objects.create(stock=stock, price=Decimal('390.00'), direction='below')
+
+        self.assertFalse(remove_from_watchlist(stock))
+        self.assertEqual(list(PriceTarget.objects.all()), [shared])
+        self.assertTrue(watched_stocks(self.alice).exists())
+
+
+class WriteQueueTest(TransactionTestCase):
+    def create(self, symbol):
+        if symbol == 'FAIL':
+            raise ValueError('rejected')
+        return Stock.objects.create(symbol=symbol, name=symbol, current_price=Decimal('10.00'))
+
+    def test_failed_job_only_rolls_back_itself(self):
+        writes = WriteQueue()
+        failed = writes.submit(self.create, 'FAIL')
+        created = writes.submit(self.create, 'AAPL')
+
+        with self.assertRaises(ValueError):
+            failed.result(timeout=5)
+        self.assertEqual(created.result(timeout=5).symbol, 'AAPL')
+        self.assertTrue(Stock.objects.filter(symbol='AAPL').exists())
+
+    def test_runs_inline_inside_a_transaction(self):
+        with transaction.atomic():
+            thread = WriteQueue().run(threading.current_thread)
+        self.assertIs(thread, threading.current_thread())
+
+    @override_settings(NOTIFICATION_EMAIL='alerts@example.com')
+    def test_benchmark_counts_queued_writes(self):
+        writes = get_write_queue()
+        enabled, writes.enabled = writes.enabled, True
+        self.addCleanup(setattr, writes, 'enabled', enabled)
+        jobs = writes.stats()['jobs']
+
+        result = run_scenario(5, 1, cycles=2)
+
+        # Every write ran on this thread, where its queries were counted
+        self.assertEqual(writes.stats()['jobs'], jobs)
+        self.assertTrue(writes.enabled)
+        self.assertGreater(result['queries_per_cycle'], 2)
+
+
+class TargetIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = TargetIndex()
+        self.index.loaded = True
+        for target_id, price, direction in [
+            (1, '100.00', 'above'), (2, '110.00', 'above'),
+            (3, '90.00', 'below'), (4, '80.00', 'below'),
+            (5, '100.00', 'exact'), (6, '105.00', 'exact'),
+        ]:
+            self.index.update(PriceTarget(id=target_id, stock_id=1, price=Decimal(price), direction=direction))
+
+    def triggered_ids(self, price):
+        return sorted(target.id for target in self.index.triggered(1, Decimal(price)))
+
+    def test_bisection_finds_crossed_targets(self):
+        self.assertEqual(self.triggered_ids('95.00'), [])
+        self.assertEqual(self.triggered_ids('100.05'), [1, 5])
+        self.assertEqual(self.triggered_ids('110.00'), [1, 2])
+        self.assertEqual(self.triggered_ids('85.00'), [3])
+        self.assertEqual(self.triggered_ids('80.00'), [3, 4])
+
+    def test_proximity_to_nearest_uncrossed_target(self):
+        has_targets, distance = self.index.proximity(1, Decimal('102.00'))
+        self.assertTrue(has_targets)
+        self.assertAlmostEqual(distance, 2 / 102)
+        self.assertAlmostEqual(self.index.proximity(1, Decimal('125.00'))[1], 20 / 125)
+        self.assertEqual(self.index.proximity(2, Decimal('100.00')), (False, None))
+
+    def test_incremental_updates(self):
+        self.index.update(PriceTarget(id=1, stock_id=1, price=Decimal('100.00'), direction='above', is_active=False))
+        self.index.remove(2)
+        self.assertEqual(self.triggered_ids('120.00'), [])
+
+        self.index.remove_stock(1)
+        self.assertEqual(self.triggered_ids('85.00'), [])
+        self.assertEqual(self.index.targets_for(1), [])
+
+
+class TargetIndexReloadTest(TestCase):
+    def test_reloads_targets_changed_by_another_process(self):
+        stock = Stock.objects.create(symbol='AAPL', current_price=Decimal('180.00'))
+        index = TargetIndex()
+        self.assertEqual(index.triggered(stock.id, Decimal('200.00')), [])
+        index.refresh()
+        self.assertTrue(index.loaded)
+
+        # Saved elsewhere, so no signal reaches this index
+        target = PriceTarget.objects.create(stock=stock, price=Decimal('190.00'), direction='above')
+        self.assertEqual(index.triggered(stock.id, Decimal('200.00')), [])
+
+        index.refresh()
+        self.assertEqual([entry.id for entry in index.triggered(stock.id, Decimal('200.00'))], [target.id])
+
+        target.delete()
+        index.refresh()
+        self.assertEqual(index.triggered(stock.id, Decimal('200.00')), [])
+
+    def test_changes_in_this_process_keep_index_loaded(self):
+        stock = Stock.objects.create(symbol='AAPL', current_price=Decimal('180.00'))
+        target_index.reset()
+        target_index.ensure_loaded()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            target = PriceTarget.objects.create(stock=stock, price=Decimal('190.00'), direction='above')
+        with self.captureOnCommitCallbacks(execute=True):
+            PriceTarget.objects.create(stock=stock, price=Decimal('170.00'), direction='below')
+            target.delete()
+
+        with self.assertNumQueries(1):  # Just the generation check
+            target_index.refresh()
+        self.assertTrue(target_index.loaded)
+        self.assertEqual([entry.price for entry in target_index.targets_for(stock.id)], [Decimal('170.00')])
+
+
+class RecordingHub(EventHub):
+    """Hub with one listener that records what it is sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def __len__(self):
+        return 1
+
+    def publish(self, event, data):
+        self.published.append((event, data))
+
+
+class CrossProcessTest(TestCase):
+    def test_events_stored_with_the_writes(self):
+        stock = Stock.objects.create(symbol='AAPL', current_price=Decimal('180.00'), previous_close=Decimal('185.00'))
+        StockMonitor(provider=ReplayProvider()).check_price_alerts(stock, {'current_price': Decimal('182.00')})
+
+        event = StreamEvent.objects.get()
+        self.assertEqual((event.origin, event.event), (PROCESS_ID, 'prices'))
+        self.assertEqual([price['symbol'] for price in event.data], ['AAPL'])
+
+    def test_relay_publishes_events_from_other_processes(self):
+        hub = RecordingHub()
+        relay = EventRelay(hub, origin='web-1')
+        StreamEvent.objects.create(origin='worker-1', event='prices', data=[{'symbol': 'OLD'}])
+        self.assertEqual(relay.poll(), 0)  # Starts from the newest event
+
+        StreamEvent.objects.create(origin='worker-1', event='prices', data=[{'symbol': 'AAPL'}])
+        StreamEvent.objects.create(origin='web-1', event='alert', data={'symbol': 'AAPL'})
+        self.assertEqual(relay.poll(), 1)
+        self.assertEqual(hub.published, [('prices', [{'symbol': 'AAPL'}])])
+        self.assertEqual(relay.poll(), 0)
+
+    def test_new_leader_rebuilds_updater_state(self):
+        monitor = StockMonitor(provider=ReplayProvider())
+        monitor.indicators.update('AAPL', Decimal('180.00'))
+        monitor.indicators_seeded = True
+        target_index.ensure_loaded()
+
+        monitor.reset_state()
+
+        self.assertEqual(monitor.indicators.states, {})
+        self.assertFalse(monitor.indicators_seeded)
+        self.assertFalse(target_index.loaded)
+
+    def test_updater_wakes_for_stock_added_elsewhere(self):
+        updater = StockPriceUpdater()
+        updater.poll_interval = 0.01
+        updater.write_metrics = lambda: None
+        generation = updater.stocks_generation()
+
+        Stock.objects.create(symbol='MSFT')
+
+        started = time.monotonic()
+        updater.wait(30, generation)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class AlertDigestTest(SimpleTestCase):
+    def test_triggers_grouped_by_recipient_and_symbol(self):
+        apple = Stock(symbol='AAPL', name='Apple Inc.', previous_close=Decimal('185.00'))
+        microsoft = Stock(symbol='MSFT', name='Microsoft', previous_close=Decimal('400.00'))
+        digest = AlertDigest()
+        digest.add('a@example.com', apple, PriceTarget(price=Decimal('190.00'), direction='above'), Decimal('191.00'))
+        digest.add('a@example.com', apple, PriceTarget(price=Decimal('200.00'), direction='below'), Decimal('191.00'))
+        digest.add('a@example.com', microsoft, PriceTarget(price=Decimal('390.00'), direction='below'), Decimal('389.00'))
+        digest.add('b@example.com', apple, PriceTarget(price=Decimal('190.00'), direction='above'), Decimal('191.00'))
+        self.assertEqual(len(digest), 4)
+
+        messages = {recipient: (subject, body) for recipient, subject, body in digest.drain()}
+
+        self.assertEqual(set(messages), {'a@example.com', 'b@example.com'})
+        subject, body = messages['a@example.com']
+        self.assertIn("3 targets on AAPL, MSFT", subject)
+        self.assertEqual(body.count("AAPL (Apple Inc.)"), 1)
+        self.assertIn("  - above $190.00\n  - below $200.00", body)
+        self.assertIn("MSFT (Microsoft)", body)
+        subject, body = messages['b@example.com']
+        self.assertIn("1 target on AAPL", subject)
+        self.assertNotIn("MSFT", body)
+
+        self.assertEqual(len(digest), 0)
+        self.assertFalse(digest.is_due())
+        self.assertEqual(digest.drain(), [])
+
+    def test_due_after_max_delay(self):
+        digest = AlertDigest(max_delay=0)
+        self.assertFalse(digest.is_due())
+        digest.add('a@example.com', Stock(symbol='AAPL'), PriceTarget(price=Decimal('1'), direction='above'), Decimal('2'))
+        self.assertTrue(digest.is_due())
+
+
+class QuoteCacheTest(SimpleTestCase):
+    def test_fields_expire_independently(self):
+        cache = QuoteCache(ttls={'current_price': -1})
+        cache.put('aapl', {'current_price': Decimal('190.00'), 'name': 'Apple Inc.'})
+
+        self.assertIsNone(cache.get('AAPL', ('current_price', 'name')))
+        self.assertEqual(cache.get('AAPL', ('name',)), {'name': 'Apple Inc.'})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_symbol_is_evicted(self):
+        cache = QuoteCache(max_size=2)
+        cache.put('AAPL', {'name': 'Apple Inc.'})
+        cache.put('MSFT', {'name': 'Microsoft'})
+        cache.get('AAPL', ('name',))
+        cache.put('GOOG', {'name': 'Alphabet'})
+
+        self.assertIsNotNone(cache.get('AAPL', ('name',)))
+        self.assertIsNone(cache.get('MSFT', ('name',)))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class OverviewAccumulatorTest(SimpleTestCase):
+    def test_aggregates_and_top_movers(self):
+        overview = OverviewAccumulator(top=2)
+        for symbol, price, sector in [
+            ('AAA', '110.00', 'Technology'), ('BBB', '105.00', 'Technology'),
+            ('CCC', '100.00', 'Energy'), ('DDD', '90.00', 'Energy'),
+        ]:
+            overview.add(Stock(symbol=symbol, current_price=Decimal(price), previous_close=Decimal('100.00'),
+                               market_cap=1000, sector=sector))
+        result = overview.build()
+
+        self.assertEqual((result.advancers, result.decliners, result.unchanged), (2, 1, 1))
+        self.assertEqual(result.average_change, Decimal('1.25'))
+        self.assertEqual(result.total_market_cap, 4000)
+        self.assertEqual(result.sectors['Energy'], {'count': 2, 'average_change': -5.0})
+        self.assertEqual([mover['symbol'] for mover in result.top_gainers], ['AAA', 'BBB'])
+        self.assertEqual(result.top_losers, [{'symbol': 'DDD', 'change_percentage': -10.0}])
+
+
+class IndicatorStateTest(SimpleTestCase):
+    def test_moving_average_crossover(self):
+        state = IndicatorState()
+        for price in [100] * 20:
+            state.add(price)
+        self.assertFalse(state.is_triggered('price_ma20', 'above', 0))
+
+        state.add(110)
+        self.assertTrue(state.is_triggered('price_ma20', 'above', 0))
+        self.assertTrue(state.is_triggered('ma5_ma20', 'above', 0))
+        self.assertFalse(state.is_triggered('price_ma20', 'below', 0))
+
+        state.add(111)
+        self.assertFalse(state.is_triggered('price_ma20', 'above', 0))
+
+    def test_rsi_threshold(self):
+        state = IndicatorState()
+        for price in range(100, 116):
+            state.add(price)
+        self.assertEqual(state.rsi.value, 100.0)
+        self.assertTrue(state.is_triggered('rsi', 'above', 70))
+        self.assertFalse(state.is_triggered('rsi', 'below', 30))
+
+
+class MarketCalendarTest(SimpleTestCase):
+    def setUp(self):
+        self.calendar = MarketCalendar({
+            'US': {'holidays': {'2026-12-25': 'Christmas Day'}, 'early_closes': {'2026-12-24': '13:00'}},
+        })
+
+    def test_sessions(self):
+        self.assertEqual(self.calendar.session('AAPL', utc(2026, 10, 19, 12)), 'pre')
+        self.assertEqual(self.calendar.session('AAPL', utc(2026, 10, 19, 14)), 'regular')
+        self.assertEqual(self.calendar.session('AAPL', utc(2026, 10, 20, 1)), 'closed')
+        self.assertEqual(self.calendar.session('AAPL', utc(2026, 12, 24, 19)), 'post')
+        self.assertEqual(self.calendar.session('VOD.L', utc(2026, 10, 19, 14)), 'regular')
+        self.assertEqual(self.calendar.session('BTC-USD', utc(2026, 10, 18, 14)), 'regular')
+
+    def test_next_open_skips_weekends_and_holidays(self):
+        self.assertEqual(self.calendar.next_open('AAPL', utc(2026, 10, 17, 12)), utc(2026, 10, 19, 8))
+        self.assertEqual(self.calendar.next_open('AAPL', utc(2026, 12, 25, 12)), utc(2026, 12, 28, 9))
+        self.assertEqual(
+            MarketCalendar(extended_hours=False).next_open('AAPL', utc(2026, 10, 17, 12)),
+            utc(2026, 10, 19, 13, 30),
+        )
+        self.assertEqual(self.calendar.open_symbols(['AAPL', 'VOD.L'], utc(2026, 10, 19, 7, 30)), ['VOD.L'])
+
+
+class RefreshSchedulerTest(SimpleTestCase):
+    def test_near_targets_refresh_sooner(self):
+        scheduler = RefreshScheduler(tick=15, base_interval=60, min_interval=15, max_interval=300)
+        for symbol in ('NEAR', 'FAR'):
+            scheduler.schedule(symbol, 100, 0.01, True, now=0)
+            scheduler.schedule(symbol, 101, 0.01, True, now=60)
+        scheduler.schedule('NEAR', 100, 0.002, True, now=120)
+        scheduler.schedule('FAR', 100, 0.2, True, now=120)
+        scheduler.schedule('NONE', 100, None, False, now=120)
+
+        self.assertEqual(scheduler.intervals['NEAR'], 15)
+        self.assertEqual(scheduler.intervals['FAR'], 300)
+        self.assertEqual(scheduler.intervals['NONE'], 300)
+        self.assertEqual(scheduler.due(['NEAR', 'FAR', 'NONE'], now=140), ['NEAR'])
+
+    def test_zero_is_a_valid_clock_reading(self):
+        scheduler = RefreshScheduler(tick=15, base_interval=60, min_interval=15, max_interval=300)
+        scheduler.schedule('AAPL', 100, None, False, now=0)
+        self.assertEqual(scheduler.next_due['AAPL'], scheduler.intervals['AAPL'])
+        self.assertEqual(scheduler.due(['AAPL'], now=0), [])
+
+    def test_budget_defers_overdue_symbols(self):
+        scheduler = RefreshScheduler(tick=15, base_interval=60)
+        symbols = [f"S{i}" for i in range(8)]
+        self.assertEqual(len(scheduler.due(symbols, now=0)), 2)
+        self.assertEqual(scheduler.capacity(8), 2)
+
+        scheduler.finish_cycle(20)
+        self.assertEqual(scheduler.stats()['overruns'], 1)
+
+
+class LeaderElectionTest(SimpleTestCase):
+    def test_callbacks_follow_lease(self):
+        class FakeLease:
+            held = True
+
+            def acquire(self):
+                if isinstance(self.held, Exception):
+                    raise self.held
+                return self.held
+
+        lease = FakeLease()
+        events = []
+        election = LeaderElection(lease, on_elected=lambda: events.append('elected'),
+                                  on_deposed=lambda: events.append('deposed'))
+
+        election.check()
+        election.check()
+        lease.held = RuntimeError('database is locked')
+        election.check()
+        lease.held = False
+        election.check()
+        lease.held = True
+        election.check()
+
+        self.assertEqual(events, ['elected', 'deposed', 'elected'])
+        self.assertTrue(election.is_leader)
+
+
+class StartupTest(SimpleTestCase):
+    def test_updater_skipped_for_management_commands(self):
+        for argv in (['manage.py', 'migrate'], ['/usr/bin/django-admin', 'test', 'core'],
+                     ['/venv/lib/django/__main__.py', 'shell'], ['manage.py', 'run_price_worker']):
+            self.assertTrue(runs_management_command(argv), argv)
+        for argv in (['manage.py', 'runserver'], ['/venv/bin/gunicorn', 'stockwatch.wsgi'],
+                     ['uvicorn', 'stockwatch.asgi:application'], ['gunicorn']):
+            self.assertFalse(runs_management_command(argv), argv)
+
+
+class HashRingTest(SimpleTestCase):
+    def test_adding_a_node_moves_only_its_share(self):
+        symbols = [f"SYM{i}" for i in range(2000)]
+        ring = HashRing(['worker-a', 'worker-b', 'worker-c'])
+        before = {symbol: ring.node_for(symbol) for symbol in symbols}
+
+        ring.add('worker-d')
+        moved = [symbol for symbol in symbols if ring.node_for(symbol) != before[symbol]]
+
+        self.assertTrue(all(ring.node_for(symbol) == 'worker-d' for symbol in moved))
+        self.assertLess(abs(len(moved) - len(symbols) / 4), len(symbols) / 10)
+        self.assertEqual(sum(ring.assignment(symbols).values()), len(symbols))
+
+
+class MetricsTest(SimpleTestCase):
+    def test_render_prometheus_text(self):
+        registry = Registry()
+        errors = registry.counter('test_errors_total', 'Errors', ('symbol',))
+        latency = registry.histogram('test_seconds', 'Latency', buckets=(0.1, 1))
+        registry.gauge('test_depth', 'Depth', collect=lambda: {(): 3})
+        errors.inc('AAPL')
+        errors.inc('AAPL')
+        latency.observe(0.05)
+        latency.observe(0.5)
+
+        text = render(registry.families({'instance': 'web-1'}))
+
+        self.assertIn('# TYPE test_errors_total counter', text)
+        self.assertIn('test_errors_total{symbol="AAPL",instance="web-1"} 2', text)
+        self.assertIn('test_seconds_bucket{le="0.1",instance="web-1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf",instance="web-1"} 2', text)
+        self.assertIn('test_seconds_count{instance="web-1"} 2', text)
+        self.assertIn('test_depth{instance="web-1"} 3', text)
+
+    def test_report_cache_metrics_exported(self):
+        ReportCache().get_or_render('METRICS', lambda: None)
+
+        text = render(registry.families())
+
+        self.assertIn('stockwatch_report_cache_misses_total ', text)
+        self.assertIn('stockwatch_report_not_modified_total ', text)
+        self.assertRegex(text, r'stockwatch_report_render_seconds_count [1-9]')
+
+
+class MetricsViewTest(TestCase):
+    def test_serves_prometheus_text(self):
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE stockwatch_report_cache_hits_total counter', text)
+        self.assertIn('stockwatch_outbox_alerts{status="pending"} 0', text)
+
+
+class RateLimitFilterTest(SimpleTestCase):
+    def record(self, level=logging.INFO, lineno=10):
+        return logging.LogRecord('core.fetcher', level, __file__, lineno, 'Provider failed', None, None)
+
+    def test_limits_each_call_site_and_reports_suppressed(self):
+        rate_limit = RateLimitFilter(rate=0, burst=2)
+
+        allowed = [rate_limit.filter(self.record()) for _ in range(5)]
+        self.assertEqual(allowed, [True, True, False, False, False])
+        self.assertTrue(rate_limit.filter(self.record(lineno=20)))
+        self.assertTrue(rate_limit.filter(self.record(level=logging.ERROR)))
+
+        rate_limit.buckets[('core.fetcher', 10)][0] = 1
+        record = self.record()
+        self.assertTrue(rate_limit.filter(record))
+        self.assertEqual(record.getMessage(), 'Provider failed (3 similar messages suppressed)')
+
+    def test_decision_is_shared_between_handlers(self):
+        rate_limit = RateLimitFilter(rate=0, burst=1)
+        record = self.record()
+        self.assertTrue(rate_limit.filter(record))
+        self.assertTrue(rate_limit.filter(record))
+        self.assertFalse(rate_limit.filter(self.record()))
+
+    def test_lazy_json_formats_only_when_emitted(self):
+        self.assertEqual(str(LazyJSON({'price': Decimal('1.50')})), '{"price": "1.50"}')
+
+
+class BatchRecordingProvider(ReplayProvider):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def get_quotes(self, symbols):
+        self.batches.append(sorted(symbols))
+        return super().get_quotes(symbols)
+
+
+class FetchEngineTest(SimpleTestCase):
+    def test_token_bucket_paces_after_burst(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        waits = [bucket.acquire() for _ in range(3)]
+        self.assertLess(max(waits[:2]), 0.01)
+        self.assertGreater(waits[2], 0.03)
+
+    def test_burst_below_one_still_paces(self):
+        bucket = TokenBucket(rate=20, burst=0)
+        waits = [bucket.acquire() for _ in range(2)]
+        self.assertLess(waits[0], 0.01)
+        self.assertGreater(waits[1], 0.03)
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        started = time.monotonic()
+        self.assertEqual([bucket.acquire() for _ in range(100)], [0.0] * 100)
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    def test_symbols_are_fetched_in_batches(self):
+        provider = BatchRecordingProvider()
+        engine = FetchEngine(provider, max_workers=2, rate=0, batch_size=2)
+        self.addCleanup(engine.executor.shutdown)
+
+        quotes = engine.fetch(['aapl', 'MSFT', 'AAPL', 'GOOG', 'AMZN', 'TSLA'])
+
+        self.assertEqual(sorted(quotes), ['AAPL', 'AMZN', 'GOOG', 'MSFT', 'TSLA'])
+        self.assertEqual(sorted(provider.batches), [['AAPL', 'MSFT'], ['AMZN', 'GOOG'], ['TSLA']])
+        stats = engine.stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['errors'], 0)
+
+
+class ReplayProviderTest(SimpleTestCase):
+    def test_info_tolerates_missing_fields(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'NEWCO': {'quotes': [{'current_price': '12.50', 'previous_close': None}]}}, f)
+        self.addCleanup(os.remove, f.name)
+
+        info = ReplayProvider(path=f.name).get_info('NEWCO')
+        self.assertEqual(info['currentPrice'], 12.5)
+        self.assertIsNone(info['previousClose'])
+        self.assertIsNone(info['dayHigh'])
+
 
-        # Print email content for verification
-        print("\nTest Email Content:")
-        print("-" * 40)
-        print(email.body)
-        print("-" * 40)
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
 
 
 def display_test_alert():
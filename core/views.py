@@ -1,21 +1,36 @@
 # core/views.py
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.http import http_date
 from decimal import Decimal
 from .stock_monitor import StockMonitor
-from .models import Stock, PriceTarget
-from django.shortcuts import render
+from .models import MarketOverview, Stock, PriceTarget
+from .overview import overview_data
+from .events import event_hub, get_event_relay
+from .card_cache import card_cache
+from .db_writer import get_write_queue
+from .history import daily_closes, get_bars
+from .logging_utils import LazyJSON
+from .metrics import PROCESS_ID, database_families, read_snapshots, registry, snapshot_config
+from .metrics import render as render_metrics
+from .providers import get_provider
+from .quote_cache import quote_cache
+from .report_cache import report_cache
+from .watchlist import add_to_watchlist, remove_from_watchlist, watched_stocks, watchlist_page
 import anthropic
 import requests
-from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-import yfinance as yf
 import json
 import logging
 
@@ -26,15 +41,40 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+SSE_KEEPALIVE = 30  # seconds between keepalive comments on idle streams
+
+
+def request_user(request):
+    """The signed-in user, or None when StockWatch is used without accounts"""
+    return request.user if request.user.is_authenticated else None
+
 
 def landing_page(request):
     return render(request, 'core/landing.html')
 
 
 def dashboard(request):
-    stocks = Stock.objects.all().prefetch_related('pricetarget_set')
-    logger.info(f"Retrieved {stocks.count()} stocks for dashboard")
-    return render(request, 'core/dashboard.html', {'stocks': stocks})
+    # Read everything in one transaction so the cards and the overview
+    # come from the same committed snapshot
+    with transaction.atomic():
+        cards = card_cache.cards(request_user(request))
+        overview = MarketOverview.objects.first()
+    logger.info(f"Retrieved {len(cards)} stocks for dashboard")
+    return render(request, 'core/dashboard.html', {
+        'cards': cards,
+        'overview': overview,
+    })
+
+
+def market_overview(request):
+    """Aggregates from the most recent update cycle"""
+    overview = MarketOverview.objects.first()
+    if overview is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'No market overview yet'
+        }, status=404)
+    return JsonResponse({'status': 'success', 'overview': overview_data(overview)})
 
 
 @require_http_methods(["POST"])
@@ -51,40 +91,45 @@ def add_stock(request):
                 'message': 'Symbol not provided'
             })
 
-        # Check if stock already exists
-        if Stock.objects.filter(symbol=symbol.upper()).exists():
+        user = request_user(request)
+        stock = Stock.objects.filter(symbol=symbol.upper()).first()
+        if stock is None:
+            # New to the registry; anyone watching it already keeps it current
+            monitor = StockMonitor()
+            info = monitor.get_stock_info(symbol)
+            logger.debug("Fetched info for %s: %s", symbol, LazyJSON(info))
+
+            if not info or not info.get('current_price'):
+                logger.error(f"Unable to fetch stock info for {symbol}")
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Unable to fetch stock info'
+                })
+            quote = {
+                'current_price': info['current_price'],
+                'previous_close': info['previous_close'],
+                'market_cap': info['market_cap'],
+                'volume': info['volume'],
+                'day_high': info['day_high'],
+                'day_low': info['day_low'],
+                'name': info['name'],
+                'sector': info.get('sector'),
+            }
+        else:
+            quote = None
+
+        stock, added = get_write_queue().run(add_to_watchlist, symbol, user, quote)
+        if not added:
             logger.warning(f"Stock {symbol} already exists")
             return JsonResponse({
                 'status': 'error',
                 'message': 'Stock already exists'
             })
-
-        monitor = StockMonitor()
-        info = monitor.get_stock_info(symbol)
-        logger.info(f"Fetched info for {symbol}: {info}")
-
-        if info and info.get('current_price'):
-            stock = Stock.objects.create(
-                symbol=symbol.upper(),
-                current_price=info['current_price'],
-                previous_close=info['previous_close'],
-                market_cap=info['market_cap'],
-                volume=info['volume'],
-                day_high=info['day_high'],
-                day_low=info['day_low'],
-                name=info['name']
-            )
-            logger.info(f"Successfully created stock: {stock.symbol} with price {stock.current_price}")
-            return JsonResponse({
-                'status': 'success',
-                'price': float(info['current_price'])
-            })
-        else:
-            logger.error(f"Unable to fetch stock info for {symbol}")
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Unable to fetch stock info'
-            })
+        logger.info(f"Added {stock.symbol} with price {stock.current_price} to {user or 'the shared'} watchlist")
+        return JsonResponse({
+            'status': 'success',
+            'price': float(stock.current_price)
+        })
     except Exception as e:
         logger.error(f"Error adding stock: {str(e)}", exc_info=True)
         return JsonResponse({
@@ -97,11 +142,24 @@ def add_stock(request):
 def add_target(request, stock_id):
     try:
         data = json.loads(request.body)
-        stock = get_object_or_404(Stock, id=stock_id)
+        user = request_user(request)
+        stock = get_object_or_404(watched_stocks(user), id=stock_id)
         logger.info(f"Adding target for stock {stock.symbol}")
 
         price = data.get('price')
         direction = data.get('direction')
+        condition = data.get('condition') or 'price'
+
+        if condition not in dict(PriceTarget.CONDITION_CHOICES):
+            logger.warning(f"Invalid condition provided: {condition}")
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Invalid condition'
+            })
+
+        # Crossover conditions have no threshold of their own
+        if condition in ('price_ma20', 'ma5_ma20') and not price:
+            price = 0
 
         if not price or not direction:
             logger.warning("Missing price or direction in target creation")
@@ -117,10 +175,20 @@ def add_target(request, stock_id):
                 'message': 'Invalid direction'
             })
 
-        target = PriceTarget.objects.create(
+        if condition != 'price' and direction == 'exact':
+            logger.warning(f"Exact direction used with indicator condition {condition}")
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Indicator conditions must be above or below'
+            })
+
+        target = get_write_queue().run(
+            PriceTarget.objects.create,
             stock=stock,
+            user=user,
             price=price,
-            direction=direction
+            direction=direction,
+            condition=condition
         )
         logger.info(f"Created price target: {target}")
         return JsonResponse({'status': 'success'})
@@ -135,9 +203,13 @@ def add_target(request, stock_id):
 @require_http_methods(["POST"])
 def delete_target(request, stock_id, target_id):
     try:
-        target = get_object_or_404(PriceTarget, id=target_id, stock_id=stock_id)
+        targets = PriceTarget.objects.filter(stock_id=stock_id)
+        user = request_user(request)
+        if user is not None:
+            targets = targets.filter(user=user)
+        target = get_object_or_404(targets, id=target_id)
         logger.info(f"Deleting target {target}")
-        target.delete()
+        get_write_queue().run(target.delete)
         return JsonResponse({'status': 'success'})
     except Exception as e:
         logger.error(f"Error deleting target: {str(e)}", exc_info=True)
@@ -150,9 +222,15 @@ def delete_target(request, stock_id, target_id):
 @require_http_methods(["POST"])
 def delete_stock(request, stock_id):
     try:
-        stock = get_object_or_404(Stock, id=stock_id)
-        logger.info(f"Deleting stock {stock.symbol}")
-        stock.delete()
+        user = request_user(request)
+        stock = get_object_or_404(watched_stocks(user), id=stock_id)
+        logger.info(f"Removing {stock.symbol} from {user or 'the shared'} watchlist")
+        deleted = get_write_queue().run(remove_from_watchlist, stock, user)
+        if user is None and not deleted:
+            return JsonResponse({
+                'status': 'error',
+                'message': "Stock is on other users' watchlists"
+            })
         return JsonResponse({'status': 'success'})
     except Exception as e:
         logger.error(f"Error deleting stock: {str(e)}", exc_info=True)
@@ -162,17 +240,54 @@ def delete_stock(request, stock_id):
         })
 
 
-def check_prices(request):
+@require_http_methods(["GET"])
+def watchlist(request):
+    """A page of the watchlist, filtered and sorted in the database; see core.watchlist"""
     try:
-        logger.info("Starting price check for all stocks")
-        monitor = StockMonitor()
-        stocks = Stock.objects.all()
-        logger.info(f"Checking prices for {stocks.count()} stocks")
+        page = watchlist_page(request.GET, request_user(request))
+    except ValueError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+    return JsonResponse({'status': 'success', **page})
+
+
+@require_http_methods(["GET", "POST"])
+def check_prices(request):
+    """
+    Latest prices as written by the background updater.
 
+    This only reads the stored snapshot; it never fetches quotes. Pass
+    ?since=<updated_at from a previous response> to get only the stocks
+    that changed since then.
+    """
+    try:
+        stocks = Stock.objects.only(
+            'id', 'symbol', 'current_price', 'previous_close', 'last_updated'
+        ).order_by()
+        since = parse_datetime(request.GET.get('since', ''))
+        if since:
+            stocks = stocks.filter(last_updated__gt=since)
+
+        snapshot = []
+        updated_at = since
         for stock in stocks:
-            monitor.check_price_alerts(stock)
+            snapshot.append({
+                'id': stock.id,
+                'symbol': stock.symbol,
+                'price': float(stock.current_price) if stock.current_price is not None else None,
+                'change': float(stock.price_change),
+                'change_percentage': float(stock.price_change_percentage),
+            })
+            if updated_at is None or stock.last_updated > updated_at:
+                updated_at = stock.last_updated
 
-        return JsonResponse({'status': 'success'})
+        return JsonResponse({
+            'status': 'success',
+            'stocks': snapshot,
+            'updated_at': updated_at.isoformat() if updated_at else None,
+        })
     except Exception as e:
         logger.error(f"Error checking prices: {str(e)}", exc_info=True)
         return JsonResponse({
@@ -181,6 +296,80 @@ def check_prices(request):
         })
 
 
+async def price_stream(request):
+    """
+    Server-sent events with price deltas and alerts from the updater, which
+    reach processes other than the updater's through core.events.EventRelay.
+
+    Streaming needs an ASGI server (e.g. ``uvicorn stockwatch.asgi:application``);
+    under WSGI the endpoint refuses the connection and the dashboard falls
+    back to polling check_prices.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Live updates require the ASGI server'
+        }, status=503)
+
+    get_event_relay().start()
+
+    async def stream():
+        subscriber = event_hub.subscribe()
+        queue = subscriber[1]
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics(request):
+    """Prometheus metrics for this process, the updater processes and the outbox"""
+    snapshot_dir, max_age = snapshot_config()
+    families = registry.families({'instance': PROCESS_ID})
+    families += read_snapshots(snapshot_dir, max_age)
+    families += database_families()
+    return HttpResponse(render_metrics(families), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def price_history(request, symbol):
+    """One-minute bars for a symbol from the local history store"""
+    try:
+        start = parse_datetime(request.GET.get('start', '')) or timezone.now() - timedelta(days=1)
+        end = parse_datetime(request.GET.get('end', ''))
+        bars = get_bars(symbol, start, end)
+        return JsonResponse({
+            'status': 'success',
+            'symbol': symbol.upper(),
+            'bars': [
+                {
+                    'time': timestamp.isoformat(),
+                    'open': float(open_price),
+                    'high': float(high),
+                    'low': float(low),
+                    'close': float(close),
+                    'volume': volume,
+                }
+                for timestamp, open_price, high, low, close, volume in bars
+            ],
+        })
+    except Exception as e:
+        logger.error(f"Error reading history for {symbol}: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        })
+
+
 def test_stock_alert(request):
     monitor = StockMonitor()
     example_stock = Stock(
@@ -212,8 +401,8 @@ def test_stock_alert(request):
         f"StockWatch - Your Market Monitor"
     )
 
-    monitor.send_gmail_alert(subject, message)
-    return JsonResponse({'status': 'success', 'message': 'Test alert sent'})
+    monitor.queue_alert(subject, message)
+    return JsonResponse({'status': 'success', 'message': 'Test alert queued'})
 
 
 def reports_page(request):
@@ -256,11 +445,14 @@ def analyze_volume(info):
         return "Volume analysis unavailable"
 
 
-def analyze_price_trend(hist):
+def analyze_price_trend(closes):
     try:
-        last_price = hist['Close'][-1]
-        ma20 = hist['Close'].rolling(window=20).mean().iloc[-1]
-        ma5 = hist['Close'].rolling(window=5).mean().iloc[-1]
+        closes = [float(close) for close in closes]
+        if len(closes) < 20:
+            raise ValueError("Not enough history for a 20-day average")
+        last_price = closes[-1]
+        ma20 = sum(closes[-20:]) / 20
+        ma5 = sum(closes[-5:]) / 5
 
         trend = []
         if last_price > ma20:
@@ -305,23 +497,39 @@ def analyze_market_position(info):
         return "Market position analysis unavailable"
 
 
-@require_http_methods(["POST"])
-def generate_report(request):
-    try:
-        data = json.loads(request.body)
-        symbol = data.get('topic', '').upper()
+REPORT_STOCK_FIELDS = {
+    'currentPrice': 'current_price',
+    'previousClose': 'previous_close',
+    'dayLow': 'day_low',
+    'dayHigh': 'day_high',
+    'volume': 'volume',
+    'marketCap': 'market_cap',
+}
 
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
 
-        if not info or 'longName' not in info:
-            return JsonResponse({
-                'error': 'Could not find stock information'
-            }, status=400)
+def build_report(symbol, stock=None):
+    """Render the HTML report for a symbol, or None if it is unknown"""
+    provider = get_provider()
+    info = quote_cache.get_or_load(symbol, 'info', lambda: provider.get_info(symbol))
+
+    if not info or 'longName' not in info:
+        return None
 
-        hist = ticker.history(period="1mo")
+    if stock is not None:
+        # The updater's last quote is newer than the cached provider info
+        info = dict(info)
+        for key, field in REPORT_STOCK_FIELDS.items():
+            value = getattr(stock, field)
+            if value is not None:
+                info[key] = float(value) if isinstance(value, Decimal) else value
 
-        report = f"""<div class="text-[#C6A265]">
+    # Prefer locally stored history; download a month only when it is too short
+    closes = daily_closes(symbol)
+    if len(closes) < 20:
+        hist = quote_cache.get_or_load(symbol, 'history', lambda: provider.get_history(symbol, period="1mo"))
+        closes = list(hist['Close'])
+
+    report = f"""<div class="text-[#C6A265]">
 <h1 class="text-2xl font-bold mb-4">Financial Report for {symbol}</h1>
 
 <h2 class="text-xl font-semibold mt-6 mb-2">COMPANY OVERVIEW</h2>
@@ -354,20 +562,53 @@ def generate_report(request):
 <div class="mb-4">
     <p>• Market Performance: {analyze_performance(info)}</p>
     <p>• Volume Analysis: {analyze_volume(info)}</p>
-    <p>• Price Trend: {analyze_price_trend(hist)}</p>
+    <p>• Price Trend: {analyze_price_trend(closes)}</p>
     <p>• Market Position: {analyze_market_position(info)}</p>
 </div>
 
 <p class="mt-6 text-sm">Report generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
 </div>"""
 
-        return JsonResponse({
-            'status': 'success',
-            'report': report
-        })
+    return report
+
+
+@require_http_methods(["POST"])
+def generate_report(request):
+    """
+    Financial report for a symbol, cached per symbol and REPORT_CACHE_SECONDS
+    until the updater next changes the stock.
+
+    Send the previous response's ETag as If-None-Match (or its
+    Last-Modified as If-Modified-Since) to get a 304 while it is current.
+    """
+    try:
+        data = json.loads(request.body)
+        symbol = data.get('topic', '').upper()
+
+        stock = Stock.objects.filter(symbol=symbol).first()
+        entry, cache_hit = report_cache.get_or_render(
+            symbol, lambda: build_report(symbol, stock), version=stock.version if stock else None,
+        )
+
+        if entry is None:
+            return JsonResponse({
+                'error': 'Could not find stock information'
+            }, status=400)
+
+        if report_cache.is_not_modified(request, entry):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse({
+                'status': 'success',
+                'report': entry['report']
+            })
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        response['X-Report-Cache'] = 'hit' if cache_hit else 'miss'
+        return response
 
     except Exception as e:
         logging.error(f"Error generating report: {str(e)}")
         return JsonResponse({
             'error': 'Failed to generate report. Make sure you entered a valid stock symbol.'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
@@ -0,0 +1,177 @@
+# core/watchlist.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+from .models import PriceTarget, Stock, WatchlistEntry
+
+SORT_FIELDS = ('symbol', 'change_percentage', 'volume', 'market_cap')
+NULLABLE_FIELDS = ('volume', 'market_cap')  # sorted with missing values last
+
+FILTERS = {
+    'min_change': 'change_percentage__gte',
+    'max_change': 'change_percentage__lte',
+    'min_volume': 'volume__gte',
+    'max_volume': 'volume__lte',
+    'min_market_cap': 'market_cap__gte',
+    'max_market_cap': 'market_cap__lte',
+}
+
+COLUMNS = ('id', 'symbol', 'name', 'sector', 'current_price', 'previous_close',
+           'change_percentage', 'volume', 'market_cap', 'last_updated')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+GENERATION = 'stocks'  # Generation bumped when a symbol joins the registry
+
+
+def watched_stocks(user=None):
+    """Stocks on `user`'s watchlist, or the whole registry without a user"""
+    if user is None:
+        return Stock.objects.all()
+    return Stock.objects.filter(watchers__user=user)
+
+
+def add_to_watchlist(symbol, user=None, quote=None):
+    """
+    Registry row for `symbol`, created from `quote` if nobody watches it
+    yet, and put on `user`'s watchlist, or the shared list without a user.
+    Returns (stock, added), where added is False if it was already there.
+    """
+    stock, created = Stock.objects.get_or_create(symbol=symbol.upper(), defaults=quote or {})
+    if user is None:
+        added = Stock.objects.filter(id=stock.id, shared=False).update(shared=True) > 0
+        stock.shared = True
+        return stock, added
+    _, added = WatchlistEntry.objects.get_or_create(user=user, stock=stock)
+    return stock, added
+
+
+def remove_from_watchlist(stock, user=None):
+    """
+    Take a stock off `user`'s watchlist, or the shared list without a user,
+    along with their targets for it. The registry row is deleted once it
+    is on no list and no targets are left on it; returns whether it was.
+    """
+    if user is not None:
+        WatchlistEntry.objects.filter(user=user, stock=stock).delete()
+    elif stock.watchers.exists():
+        # The shared list shows the whole registry, so it can't drop a stock users still watch
+        return False
+    else:
+        Stock.objects.filter(id=stock.id).update(shared=False)
+        stock.shared = False
+    PriceTarget.objects.filter(user=user, stock=stock).delete()
+    if (Stock.objects.filter(id=stock.id, shared=True).exists() or stock.watchers.exists()
+            or stock.pricetarget_set.exists()):
+        return False
+    stock.delete()
+    return True
+
+
+def to_python(field, value):
+    try:
+        return Stock._meta.get_field(field).to_python(value)
+    except ValidationError:
+        raise ValueError(f"Invalid value for {field}: {value}")
+
+
+def encode_cursor(value, stock_id):
+    data = json.dumps([None if value is None else str(value), stock_id])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort value as a string or None, stock id) from a cursor"""
+    try:
+        value, stock_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return value, int(stock_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def after(field, descending, value, stock_id):
+    """Rows that follow (value, stock_id) in the sort order"""
+    beyond = 'lt' if descending else 'gt'
+    if value is None:
+        # Already among the rows without a value, which come last
+        return Q(**{f'{field}__isnull': True, f'id__{beyond}': stock_id})
+    following = Q(**{f'{field}__{beyond}': value}) | Q(**{field: value, f'id__{beyond}': stock_id})
+    if field in NULLABLE_FIELDS:
+        following |= Q(**{f'{field}__isnull': True})
+    return following
+
+
+def stock_row(stock):
+    return {
+        'id': stock.id,
+        'symbol': stock.symbol,
+        'name': stock.name,
+        'sector': stock.sector,
+        'price': float(stock.current_price) if stock.current_price is not None else None,
+        'change': float(stock.price_change),
+        'change_percentage': float(stock.change_percentage),
+        'volume': stock.volume,
+        'market_cap': stock.market_cap,
+        'last_updated': stock.last_updated.isoformat(),
+    }
+
+
+def watchlist_page(params, user=None):
+    """
+    One page of `user`'s watchlist for the query parameters in `params`:
+
+        q             symbol prefix
+        sort          one of SORT_FIELDS, prefixed with '-' for descending
+        min_*/max_*   bounds from FILTERS
+        limit         rows per page, at most MAX_LIMIT
+        cursor        next_cursor from the previous page
+
+    Pages are found by keyset pagination on (sort field, id), so each is
+    one indexed range scan however deep the client has scrolled, and rows
+    added between requests don't shift the pages that follow.
+    """
+    sort = params.get('sort') or 'symbol'
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Unknown sort field: {field}")
+    try:
+        limit = min(max(int(params.get('limit') or DEFAULT_LIMIT), 1), MAX_LIMIT)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {params.get('limit')}")
+
+    stocks = watched_stocks(user).only(*COLUMNS)
+    prefix = (params.get('q') or '').strip().upper()
+    if prefix:
+        # A range rather than LIKE, so SQLite can use the symbol index
+        stocks = stocks.filter(symbol__gte=prefix, symbol__lt=prefix + '\uffff')
+    for name, lookup in FILTERS.items():
+        value = params.get(name)
+        if value not in (None, ''):
+            stocks = stocks.filter(**{lookup: to_python(lookup.split('__')[0], value)})
+
+    cursor = params.get('cursor')
+    if cursor:
+        value, stock_id = decode_cursor(cursor)
+        if value is not None:
+            value = to_python(field, value)
+        stocks = stocks.filter(after(field, descending, value, stock_id))
+
+    if field in NULLABLE_FIELDS:
+        order = F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+    else:
+        order = F(field).desc() if descending else F(field).asc()
+    rows = list(stocks.order_by(order, '-id' if descending else 'id')[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], field), rows[-1].id)
+    return {
+        'stocks': [stock_row(stock) for stock in rows],
+        'next_cursor': next_cursor,
+    }
@@ -2,6 +2,8 @@
 ASGI config for stockwatch project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it (e.g. ``uvicorn stockwatch.asgi:application``) to enable the live
+price stream at /stocks/stream/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
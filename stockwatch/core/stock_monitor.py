@@ -28,7 +28,8 @@ class StockMonitor:
             # Get regular info
             logger.info("Attempting to get regular info")
             info = ticker.info
-            logger.info(f"Regular info received: {json.dumps(dict(info), default=str)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Regular info received: {json.dumps(dict(info), default=str)}")
 
             if not info:
                 logger.warning(f"No data returned for {symbol}")
@@ -58,7 +59,8 @@ class StockMonitor:
                 'name': info.get('longName', symbol)
             }
 
-            logger.info(f"Final processed info for {symbol}: {json.dumps(stock_info, default=str)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Final processed info for {symbol}: {json.dumps(stock_info, default=str)}")
             return stock_info
 
         except Exception as e:
@@ -117,7 +119,8 @@ class StockMonitor:
                 logger.warning(f"No info available for {stock.symbol}, skipping alerts")
                 return
 
-            logger.info(f"Updating {stock.symbol} with new data: {json.dumps(info, default=str)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Updating {stock.symbol} with new data: {json.dumps(info, default=str)}")
 
             # Update stock information
             for key, value in info.items():
@@ -61,13 +61,32 @@ TEMPLATES = [
 WSGI_APPLICATION = 'stockwatch.wsgi.application'
 
 # Database
+# In WAL mode readers see the last committed snapshot instead of waiting
+# for a writer. Connections are kept open for CONN_MAX_AGE seconds rather
+# than opened per request.
+SQLITE_WAL = os.getenv('SQLITE_WAL', 'True') == 'True'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;' if SQLITE_WAL else '',
+            'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+        },
     }
 }
 
+# Writes from the updater, the outbox sender, web views, leader leases and
+# shard heartbeats are run by one writer thread, which commits everything
+# waiting (up to MAX_BATCH jobs) in a single transaction, so they never
+# contend for SQLite's write lock.
+DATABASE_WRITER = {
+    'ENABLED': os.getenv('DATABASE_WRITER', 'True') == 'True',
+    'MAX_BATCH': int(os.getenv('DATABASE_WRITER_MAX_BATCH', '100')),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,6 +133,22 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 GMAIL_EMAIL = os.getenv('GMAIL_EMAIL')
 GMAIL_APP_PASSWORD = os.getenv('GMAIL_APP_PASSWORD')
 SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+# Alert outbox delivery: batch size, poll interval and retry policy
+# (RETRY_BACKOFF doubles per attempt) for the background sender
+ALERT_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'POLL_INTERVAL': 5,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 30,
+    'IDLE_TIMEOUT': 60,
+}
+
+# Alert digest: send one summary email per recipient per update cycle
+# instead of one email per target, holding triggers at most MAX_DELAY seconds
+ALERT_DIGEST = {
+    'ENABLED': os.getenv('ALERT_DIGEST', 'False') == 'True',
+    'MAX_DELAY': int(os.getenv('ALERT_DIGEST_MAX_DELAY', '120')),
+}
 # Security Settings
 CSRF_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_SECURE = not DEBUG
@@ -128,6 +163,113 @@ SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
 
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')
 
+# Quote Provider Settings
+# Set QUOTE_PROVIDER=core.providers.ReplayProvider to run offline from
+# recorded (QUOTE_REPLAY_FILE) or synthetic quotes.
+QUOTE_PROVIDER = {
+    'BACKEND': os.getenv('QUOTE_PROVIDER', 'core.providers.YFinanceProvider'),
+    'OPTIONS': {},
+}
+if QUOTE_PROVIDER['BACKEND'] == 'core.providers.ReplayProvider':
+    QUOTE_PROVIDER['OPTIONS'] = {
+        'path': os.getenv('QUOTE_REPLAY_FILE'),
+        'latency': float(os.getenv('QUOTE_REPLAY_LATENCY', '0')),
+        'error_rate': float(os.getenv('QUOTE_REPLAY_ERROR_RATE', '0')),
+        'seed': int(os.getenv('QUOTE_REPLAY_SEED', '0')),
+    }
+
+# Concurrent quote fetching, limited to RATE provider requests per second
+# with up to BURST requests allowed back to back; RATE=0 removes the limit
+QUOTE_FETCH = {
+    'MAX_WORKERS': int(os.getenv('QUOTE_FETCH_WORKERS', '4')),
+    'RATE': float(os.getenv('QUOTE_FETCH_RATE', '2')),
+    'BURST': int(os.getenv('QUOTE_FETCH_BURST', '4')),
+    'BATCH_SIZE': int(os.getenv('QUOTE_FETCH_BATCH_SIZE', '100')),
+}
+
+# Shared quote cache: at most MAX_SIZE symbols, least recently used evicted
+# first. TTLS overrides the per-field lifetimes in core.quote_cache.DEFAULT_TTLS.
+QUOTE_CACHE = {
+    'MAX_SIZE': 5000,
+    'TTLS': {},
+    'DEFAULT_TTL': 60,
+}
+
+# Dashboard cards and rendered reports. Set CACHE_URL (redis://..., needs
+# the redis package) to share one cache between processes; otherwise each
+# process keeps its own. Either way it must hold every card of a page load,
+# one per watched stock and user, or each load evicts the cards the next
+# one needs and renders them all again.
+CACHE_URL = os.getenv('CACHE_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stockwatch',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '50000'))},
+    },
+}
+
+# Rendered reports are reused per symbol for this many seconds
+REPORT_CACHE_SECONDS = int(os.getenv('REPORT_CACHE_SECONDS', '300'))
+
+# Dashboard cards are cached per Stock.version; unused versions expire after this
+CARD_CACHE_SECONDS = int(os.getenv('CARD_CACHE_SECONDS', '86400'))
+
+# Exchange sessions: the updater only polls symbols whose exchange is
+# trading and sleeps until the next open when none are. OFF_HOURS_INTERVAL
+# (seconds) refreshes everything at a low rate while closed; 0 idles fully.
+MARKET_CALENDAR = {
+    'ENABLED': os.getenv('MARKET_CALENDAR', 'True') == 'True',
+    'HOLIDAYS_FILE': os.path.join(BASE_DIR, 'core', 'data', 'market_holidays.json'),
+    'EXTENDED_HOURS': os.getenv('MARKET_EXTENDED_HOURS', 'True') == 'True',
+    'OFF_HOURS_INTERVAL': int(os.getenv('MARKET_OFF_HOURS_INTERVAL', '0')),
+}
+
+# The price updater and outbox sender run in whichever process holds the
+# leader lease; others take over within LEASE_SECONDS + RENEW_SECONDS of
+# the leader dying, reloading the updater's state from the database. The
+# other processes keep serving requests, seeing its work via STATE_SYNC.
+# BACKEND is 'database' or 'file' (single host, Unix).
+RUN_PRICE_UPDATER = os.getenv('RUN_PRICE_UPDATER', 'True') == 'True'
+LEADER_ELECTION = {
+    'BACKEND': os.getenv('LEADER_ELECTION_BACKEND', 'database'),
+    'LEASE_SECONDS': 30,
+    'RENEW_SECONDS': 10,
+    'LOCK_FILE': os.getenv('LEADER_LOCK_FILE'),
+}
+
+# Processes share changes through the database: an updater in another
+# process polls for new stocks every POLL_SECONDS while idle and reloads its
+# target index when targets change, and web processes relay the updater's
+# live events from StreamEvent rows, kept for EVENT_RETENTION_SECONDS.
+STATE_SYNC = {
+    'POLL_SECONDS': float(os.getenv('STATE_SYNC_POLL_SECONDS', '2')),
+    'EVENT_RETENTION_SECONDS': int(os.getenv('STREAM_EVENT_RETENTION_SECONDS', '3600')),
+}
+
+# Processes running the updater write their metrics to SNAPSHOT_DIR after
+# every cycle so /metrics can report them from any web process; snapshots
+# older than SNAPSHOT_MAX_AGE seconds belong to dead processes and are ignored.
+METRICS = {
+    'SNAPSHOT_DIR': os.getenv('METRICS_SNAPSHOT_DIR'),  # default: logs/metrics
+    'SNAPSHOT_MAX_AGE': 300,
+}
+
+# Symbols are refreshed sooner the closer they are to a target relative to
+# their volatility, between MIN_INTERVAL and MAX_INTERVAL seconds, while
+# never fetching more per TICK than a flat BASE_INTERVAL refresh would.
+REFRESH_SCHEDULER = {
+    'ENABLED': os.getenv('REFRESH_SCHEDULER', 'True') == 'True',
+    'TICK': int(os.getenv('REFRESH_TICK', '15')),
+    'BASE_INTERVAL': 60,
+    'MIN_INTERVAL': 15,
+    'MAX_INTERVAL': 300,
+    'SAFETY': 0.25,
+}
+
 
 # Logging Configuration
 LOGGING = {
@@ -143,15 +285,31 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        # Per call site token bucket, so a failing provider can't flood the logs
+        'rate_limit': {
+            '()': 'core.logging_utils.RateLimitFilter',
+            'rate': float(os.getenv('LOG_RATE_LIMIT', '1')),
+            'burst': int(os.getenv('LOG_RATE_BURST', '20')),
+        },
+    },
     'handlers': {
+        # Records are queued and written by a background thread
         'console': {
-            'class': 'logging.StreamHandler',
+            '()': 'core.logging_utils.AsyncHandler',
+            'target': 'logging.StreamHandler',
             'formatter': 'verbose',
+            'filters': ['rate_limit'],
         },
+        # Every web and worker process appends to the same file, so none of
+        # them rotates it: rotate with logrotate, and each process reopens
+        # the file once it has been moved
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'stockwatch.log'),
+            '()': 'core.logging_utils.AsyncHandler',
+            'target': 'logging.handlers.WatchedFileHandler',
+            'filename': os.getenv('LOG_FILE') or os.path.join(BASE_DIR, 'logs', 'stockwatch.log'),
             'formatter': 'verbose',
+            'filters': ['rate_limit'],
         },
     },
     'root': {
@@ -167,10 +325,10 @@ LOGGING = {
         'core': {  # Add logger for our app
             'handlers': ['console', 'file'],
             'level': 'INFO',
-            'propagate': True,
+            'propagate': False,
         },
     },
 }
 
 # Ensure logs directory exists
-os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
\ No newline at end of file
+os.makedirs(os.path.dirname(LOGGING['handlers']['file']['filename']), exist_ok=True)
\ No newline at end of file
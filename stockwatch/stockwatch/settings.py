@@ -141,8 +141,10 @@ LOGGING = {
             'formatter': 'verbose',
         },
         'file': {
-            'class': 'logging.FileHandler',
+            'class': 'logging.handlers.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'stockwatch.log'),
+            'maxBytes': int(os.getenv('LOG_MAX_BYTES', '10485760')),
+            'backupCount': int(os.getenv('LOG_BACKUP_COUNT', '5')),
             'formatter': 'verbose',
         },
     },
@@ -8,11 +8,16 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.landing_page, name='landing'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('overview/', views.market_overview, name='market_overview'),
+    path('metrics', views.metrics, name='metrics'),
     path('stocks/add/', views.add_stock, name='add_stock'),
     path('stocks/<int:stock_id>/target/', views.add_target, name='add_target'),
     path('stocks/<int:stock_id>/target/<int:target_id>/delete/', views.delete_target, name='delete_target'),
     path('stocks/<int:stock_id>/delete/', views.delete_stock, name='delete_stock'),
     path('stocks/check/', views.check_prices, name='check_prices'),
+    path('stocks/stream/', views.price_stream, name='price_stream'),
+    path('stocks/watchlist/', views.watchlist, name='watchlist'),
+    path('stocks/<str:symbol>/history/', views.price_history, name='price_history'),
     path('test-alert/', views.test_stock_alert, name='test_alert'),
     path('reports/', views.reports_page, name='reports'),
     path('generate-report/', views.generate_report, name='generate_report'),